@@ -1,19 +1,46 @@
-from flask import Flask, render_template, jsonify, request, redirect, session, url_for
+from flask import Flask, render_template, jsonify, request, redirect, session, url_for, send_file
 import sys
+import atexit
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 import socket
+import stat
+import sqlite3
+import tempfile
 import hashlib
+import itertools
 import html
+import io
 import json
 import time
 import threading
 import re
+import bisect
+import heapq
+import math
+import unicodedata
+import hmac
+import gzip
+import mmap
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from functools import wraps
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from urllib.parse import quote, unquote, urljoin
 import xml.etree.ElementTree as ET
 from dotenv import load_dotenv
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # artwork is then cached as-is, without resizing
+    Image = ImageOps = None
+
+try:
+    import brotli
+except ImportError:  # static assets are then precompressed with gzip only
+    brotli = None
 
 load_dotenv()
 
@@ -63,6 +90,24 @@ DENON_ICY_PASSTHROUGH = get_env_bool("DENON_ICY_PASSTHROUGH", True)
 # restarts and the proxy adds nothing for the AVR display.
 PROXY_ALL_STREAMS = get_env_bool("PROXY_ALL_STREAMS", False)
 HOME_ASSISTANT_CORS_ORIGINS = get_env_list("HOME_ASSISTANT_CORS_ORIGINS", "*")
+# radio-browser mirrors (base URLs up to /json). Unset: discovered via DNS,
+# starting from the two German mirrors.
+RADIO_BROWSER_MIRRORS = get_env_list("RADIO_BROWSER_MIRRORS") or [
+    "https://de2.api.radio-browser.info/json",
+    "https://de1.api.radio-browser.info/json",
+]
+RADIO_BROWSER_DISCOVER_MIRRORS = not get_env_list("RADIO_BROWSER_MIRRORS")
+# Station logos and cover art fetched through /art are kept here, bounded in
+# size (least recently used images are evicted first).
+ART_CACHE_DIR = os.getenv("ART_CACHE_DIR") or os.path.join(os.path.dirname(__file__), "art_cache")
+ART_CACHE_MAX_BYTES = max(1, get_env_int("ART_CACHE_MAX_MB", 64)) * 1024 * 1024
+# Local radio-browser station catalog for search: the most clicked stations
+# are fetched in the background and indexed in memory, so search answers
+# without a radio-browser round trip and tolerates typos. 0 disables it.
+STATION_CATALOG_SIZE = max(0, get_env_int("STATION_CATALOG_SIZE", 10000))
+STATION_CATALOG_REFRESH_INTERVAL = max(1, get_env_int("STATION_CATALOG_REFRESH_HOURS", 12)) * 3600
+STATION_CATALOG_RETRY_INTERVAL = 300
+STATION_CATALOG_CHECK_INTERVAL = 60
 
 # Spotify Configuration
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
@@ -70,16 +115,353 @@ SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 SPOTIFY_REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI")
 SPOTIFY_SCOPE = "user-read-playback-state user-modify-playback-state user-read-currently-playing playlist-read-private playlist-read-collaborative user-library-read user-read-recently-played"
 SPOTIFY_TOKENS_FILE = os.path.join(os.path.dirname(__file__), "spotify_tokens.json")
+SPOTIFY_CONFIGURED = bool(SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET and SPOTIFY_REDIRECT_URI)
+
+# spotipy is only imported when Spotify is configured. Otherwise these
+# stand-ins keep the Spotify code below importable; nothing ever raises them
+# and get_spotify_client() returns None.
+if SPOTIFY_CONFIGURED:
+    import spotipy
+    from spotipy.cache_handler import CacheHandler
+    from spotipy.exceptions import SpotifyException
+    from spotipy.oauth2 import SpotifyOAuth, SpotifyOauthError
+    SpotifyClientBase = spotipy.Spotify
+else:
+    spotipy = SpotifyOAuth = None
+    CacheHandler = SpotifyClientBase = object
+
+    class SpotifyException(Exception):
+        pass
+
+    class SpotifyOauthError(Exception):
+        pass
+
+# ============ EVENT LOG ============
+# log_event(subsystem, level, template, **fields) records what the app does.
+# The template is only formatted (str.format with the fields) when the event
+# is printed or read back. Recorded fields keep only strings and numbers:
+# exceptions become their repr and other objects their str, so the ring
+# never pins an exception's traceback frames or a response body. Events
+# below the enabled levels return before touching anything; event_enabled()
+# lets a caller skip computing an expensive field the same way.
+# Recent events stay in a bounded in-memory ring buffer per process, queryable
+# at /api/debug/events, so failures can be looked at without DEBUG. DEBUG
+# prints every event to stderr; otherwise only errors are printed.
+EVENT_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+EVENT_LOG_SIZE = max(1, get_env_int("EVENT_LOG_SIZE", 1000))
+# Lowest level kept in the ring buffer; "debug" also keeps the chatter.
+EVENT_LOG_LEVEL = EVENT_LEVELS.get(os.getenv("EVENT_LOG_LEVEL", "info").lower(), EVENT_LEVELS["info"])
+EVENT_PRINT_LEVEL = EVENT_LEVELS["debug"] if DEBUG else EVENT_LEVELS["error"]
+EVENT_MIN_LEVEL = min(EVENT_LOG_LEVEL, EVENT_PRINT_LEVEL)
+EVENT_QUERY_DEFAULT_LIMIT = 200
+
+# (timestamp, level number, subsystem, template, fields); deque appends and
+# copies are atomic, so writers take no lock.
+_EVENTS = deque(maxlen=EVENT_LOG_SIZE)
+
+def log_event(subsystem, level, template, **fields):
+    level_no = EVENT_LEVELS[level]
+    if level_no < EVENT_MIN_LEVEL:
+        return
+    fields = {name: event_field_value(value) for name, value in fields.items()}
+    event = (time.time(), level_no, subsystem, template, fields)
+    if level_no >= EVENT_LOG_LEVEL:
+        _EVENTS.append(event)
+    if level_no >= EVENT_PRINT_LEVEL:
+        print(f"[{level.upper()}] {subsystem}: {format_event_message(template, fields)}", file=sys.stderr)
+
+def event_enabled(level):
+    return EVENT_LEVELS[level] >= EVENT_MIN_LEVEL
+
+def format_event_message(template, fields):
+    try:
+        return template.format(**fields)
+    except Exception:
+        return f"{template} {fields!r}"
+
+def event_field_value(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, BaseException):
+        return repr(value)
+    return str(value)
+
+def query_events(subsystems=None, min_level=0, since=0, limit=EVENT_QUERY_DEFAULT_LIMIT):
+    """Newest matching events first, formatted for JSON."""
+    level_names = {number: name for name, number in EVENT_LEVELS.items()}
+    matches = []
+    for timestamp, level_no, subsystem, template, fields in reversed(list(_EVENTS)):
+        if len(matches) >= limit or timestamp <= since:
+            break
+        if level_no < min_level or (subsystems and subsystem not in subsystems):
+            continue
+        matches.append({
+            "at": timestamp,
+            "level": level_names[level_no],
+            "subsystem": subsystem,
+            "message": format_event_message(template, fields),
+            "fields": fields,
+        })
+    return matches
 
-def log_debug(msg):
-    if DEBUG:
-        print(f"[DEBUG] {msg}", file=sys.stderr)
+@app.route('/api/debug/events')
+def api_debug_events():
+    """Recent events, e.g. ?subsystem=upnp,avr&level=warning&limit=50&since=<unix time>"""
+    subsystems = {name.strip() for name in request.args.get("subsystem", "").split(",") if name.strip()}
+    min_level = EVENT_LEVELS.get(request.args.get("level", "debug").lower(), 0)
+    try:
+        limit = max(1, min(int(request.args.get("limit", EVENT_QUERY_DEFAULT_LIMIT)), EVENT_LOG_SIZE))
+        since = float(request.args.get("since", 0))
+    except ValueError:
+        return jsonify({"error": "limit and since must be numbers"}), 400
+    return jsonify(query_events(subsystems, min_level, since, limit))
+
+# ============ METRICS ============
+# Prometheus text format at /metrics, without a client library. Recording is
+# a dict update under a lock (histograms find their bucket with bisect), so
+# it is cheap enough for the stream relay loop. Values that other objects
+# already track (cache hit counts, thread pools) are only read when /metrics
+# is scraped. Every worker process has its own numbers.
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_METRICS = []
+_METRICS_COLLECTORS = []
+_METRICS_CACHES = []
+_METRICS_THREAD_POOLS = {}
+
+class Metric:
+    """A counter, gauge or histogram with optional labels."""
+
+    def __init__(self, name, help_text, kind, labels=(), buckets=METRICS_LATENCY_BUCKETS, span=None):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.labels = labels
+        self.buckets = buckets
+        self.span = span  # also report observe_seconds() blocks as this request span
+        self._values = {}
+        self._lock = threading.Lock()
+        _METRICS.append(self)
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values):
+        self.inc(*label_values, amount=-1)
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), then sum.
+                series = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = sorted((key, list(v) if isinstance(v, list) else v) for key, v in self._values.items())
+
+        for label_values, value in values:
+            pairs = list(zip(self.labels, label_values))
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{format_metric_labels(pairs)} {value}")
+                continue
+
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), value[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_metric_labels(pairs + [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{format_metric_labels(pairs)} {value[-1]}")
+            lines.append(f"{self.name}_count{format_metric_labels(pairs)} {cumulative}")
+        return lines
+
+def escape_metric_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_metric_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_metric_label(value)}"' for name, value in pairs) + "}"
+
+# Request spans: while a request is handled, timed sub-operations of its
+# thread are collected and returned in a Server-Timing header.
+_REQUEST_SPANS = threading.local()
+
+def record_span(name, seconds, desc=None):
+    spans = getattr(_REQUEST_SPANS, "spans", None)
+    if spans is not None:
+        spans.append((name, desc, seconds))
+
+@contextmanager
+def span(name, desc=None):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started, desc)
+
+def traced(name):
+    """Decorator: report each call as a request span."""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+@contextmanager
+def observe_seconds(metric, *label_values):
+    """Time the block into a histogram whose last label is the outcome (ok/error)."""
+    started = time.monotonic()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.monotonic() - started
+        metric.observe(elapsed, *label_values, outcome)
+        if metric.span:
+            record_span(metric.span, elapsed, label_values[0] if label_values else None)
+
+def register_thread_pool(name, executor):
+    _METRICS_THREAD_POOLS[name] = executor
+    return executor
+
+AVR_HTTP_SECONDS = Metric(
+    "denon_avr_http_request_seconds", "AVR HTTP API calls", "histogram", ("call", "outcome"), span="avr")
+SOAP_ACTION_SECONDS = Metric(
+    "denon_soap_action_seconds", "UPnP AVTransport SOAP actions", "histogram", ("action", "outcome"), span="soap")
+STREAM_UPSTREAM_TTFB_SECONDS = Metric(
+    "stream_upstream_ttfb_seconds", "Time to the first audio byte from the upstream stream", "histogram")
+STREAM_UPSTREAM_ERRORS = Metric(
+    "stream_upstream_errors_total", "Streams that could not be opened upstream", "counter")
+STREAM_RELAYED_BYTES = Metric(
+    "stream_relayed_bytes_total", "Audio bytes relayed by /stream.mp3", "counter")
+STREAM_ACTIVE_LISTENERS = Metric(
+    "stream_active_listeners", "Clients currently connected to /stream.mp3", "gauge")
+RADIO_BROWSER_SECONDS = Metric(
+    "radio_browser_request_seconds", "radio-browser API requests per mirror", "histogram", ("mirror", "outcome"))
+SPOTIFY_API_SECONDS = Metric(
+    "spotify_api_request_seconds", "Spotify Web API calls", "histogram", ("endpoint", "outcome"), span="spotify")
+CACHE_REQUESTS = Metric(
+    "cache_requests_total", "Cache lookups by result", "counter", ("cache", "result"))
+HTTP_REQUESTS_IN_FLIGHT = Metric(
+    "http_requests_in_flight", "Requests being handled, not counting open streams", "gauge")
+THREAD_POOL_MAX_WORKERS = Metric(
+    "thread_pool_max_workers", "Configured size of internal thread pools", "gauge", ("pool",))
+THREAD_POOL_THREADS = Metric(
+    "thread_pool_threads", "Threads started by internal thread pools", "gauge", ("pool",))
+THREAD_POOL_QUEUED = Metric(
+    "thread_pool_queued_tasks", "Tasks waiting for a free thread (saturation)", "gauge", ("pool",))
+
+def collect_metrics():
+    for cache in _METRICS_CACHES:
+        CACHE_REQUESTS.set(cache.hits, cache.name, "hit")
+        CACHE_REQUESTS.set(cache.misses, cache.name, "miss")
+    for name, executor in _METRICS_THREAD_POOLS.items():
+        THREAD_POOL_MAX_WORKERS.set(executor._max_workers, name)
+        THREAD_POOL_THREADS.set(len(executor._threads), name)
+        THREAD_POOL_QUEUED.set(executor._work_queue.qsize(), name)
+    for collector in _METRICS_COLLECTORS:
+        collector()
+
+def render_metrics():
+    collect_metrics()
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+class ExpiringLRUCache:
+    """Thread-safe LRU mapping whose entries expire ttl seconds after being set.
+    Named caches report their hit ratio on /metrics."""
+
+    def __init__(self, max_entries, ttl, name=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if name:
+            _METRICS_CACHES.append(self)
+
+    def get(self, key, default=None):
+        return self._get(key, default, count=True)
+
+    def peek(self, key, default=None):
+        """get() without counting a hit or miss, for lookups that try several
+        keys and then count once with record()."""
+        return self._get(key, default, count=False)
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _get(self, key, default, count):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += count
+                return default
+
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.misses += count
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += count
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
 
 # State persistence
+STATE_DB_FILE = os.getenv("STATE_DB_FILE") or os.path.join(os.path.dirname(__file__), "state.db")
+# The station catalog is a large list rewritten wholesale on every refresh,
+# so it is kept next to the database in its own file instead of in it.
+STATION_CATALOG_FILE = os.getenv("STATION_CATALOG_FILE") or os.path.join(
+    os.path.dirname(os.path.abspath(STATE_DB_FILE)), "station_catalog.json"
+)
+# Pre-SQLite state files, imported into STATE_DB_FILE once. favorites.json is
+# still kept as a readable export; edits to it are picked up again.
 LAST_PLAYED_FILE = os.path.join(os.path.dirname(__file__), "last_played.json")
+FAVORITES_FILE = 'favorites.json'
 RADIO_SOURCES = {"NET", "IRADIO", "NETWORK"}
 _AV_TRANSPORT_CONTROL_URL = None
-_LAST_DENON_DISPLAY_UPDATE = {"url": None, "title": None, "at": 0}
+AV_TRANSPORT_CONTROL_URL_TTL = 24 * 3600
 _DENON_DISPLAY_UPDATE_LOCK = threading.Lock()
 _DENON_DISPLAY_WORKER_LOCK = threading.Lock()
 _DENON_DISPLAY_WORKER_STARTED = False
@@ -104,24 +486,513 @@ ET.register_namespace("dlna", DLNA_NS)
 ET.register_namespace("s", SOAP_ENV_NS)
 ET.register_namespace("u", AVTRANSPORT_NS)
 
-def save_last_played(url, name, playback_url=None):
+# Read once at import: os.umask() can only be queried by setting it, which
+# would race with other threads creating files.
+_PROCESS_UMASK = os.umask(0o022)
+os.umask(_PROCESS_UMASK)
+
+def existing_file_mode(path):
+    """Permission bits of path, or what open() would give a new file."""
     try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_PROCESS_UMASK
+
+def write_json_atomic(path, data, indent=None):
+    """Write JSON to a temp file next to path and rename it over path, so a
+    crash mid-write never leaves a truncated file behind."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        # mkstemp creates the file as 0600; keep the mode readers relied on.
+        os.fchmod(fd, existing_file_mode(path))
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+# One embedded SQLite database (WAL mode: readers never block on the writer)
+# holds favorites, last played, play history, the Spotify token and
+# persistent caches. Every thread gets its own connection; reads are served
+# from an in-process cache. Each write also stamps the keys it changed with a
+# new sequence number in the versions table; at most every
+# STATE_SYNC_INTERVAL a read looks for sequence numbers it has not seen and
+# drops just those keys, so other workers' writes are still seen and nothing
+# else is thrown away. The old JSON files are imported once on first start.
+STATE_DB_BUSY_TIMEOUT_MS = 5000
+STATE_HISTORY_MAX_ROWS = 1000
+# How long another process's write may go unnoticed by this one.
+STATE_SYNC_INTERVAL = 0.5
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS favorites (
+    url TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS play_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    played_at REAL NOT NULL,
+    url TEXT NOT NULL,
+    name TEXT,
+    playback_url TEXT
+);
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    key TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS versions_seq ON versions (seq);
+"""
+
+class StateStore:
+    """Thread-safe, read-cached access to the SQLite state database."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # _cache_lock guards _cache, _versions and _own_seqs, which readers,
+        # writers and _sync all update; it is never held during SQL.
+        self._cache_lock = threading.Lock()
+        self._cache = {}
+        self._versions = {}  # cache key -> local change counter
+        self._own_seqs = set()
+        self._sync_lock = threading.Lock()
+        self._next_sync = 0.0
+
+        with self._write_lock, self._connection() as conn:
+            conn.executescript(STATE_SCHEMA)
+            self._seen_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM versions").fetchone()[0]
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                timeout=STATE_DB_BUSY_TIMEOUT_MS / 1000,
+                check_same_thread=False,
+                cached_statements=64
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={STATE_DB_BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        return conn
+
+    def _changed(self, cache_key):
+        """Forget a cached key; ("cache", namespace) forgets the whole namespace.
+        The caller holds _cache_lock."""
+        if len(cache_key) == 2 and cache_key[0] == "cache":
+            keys = [key for key in self._cache if key[:2] == cache_key]
+        else:
+            keys = [cache_key]
+        for key in keys + [cache_key]:
+            self._cache.pop(key, None)
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def _sync(self):
+        """Drop the keys other connections changed; runs at most every STATE_SYNC_INTERVAL."""
+        if time.monotonic() < self._next_sync:
+            return
+        with self._sync_lock:
+            if time.monotonic() < self._next_sync:
+                return
+            rows = self._connection().execute(
+                "SELECT key, seq FROM versions WHERE seq > ? ORDER BY seq", (self._seen_seq,)
+            ).fetchall()
+            with self._cache_lock:
+                for key, seq in rows:
+                    if seq not in self._own_seqs:
+                        self._changed(tuple(json.loads(key)))
+                if rows:
+                    self._seen_seq = rows[-1][1]
+                    self._own_seqs = {seq for seq in self._own_seqs if seq > self._seen_seq}
+            self._next_sync = time.monotonic() + STATE_SYNC_INTERVAL
+
+    def version(self, cache_key):
+        """Counter that moves whenever the stored value of cache_key may have changed."""
+        self._sync()
+        with self._cache_lock:
+            return self._versions.get(cache_key, 0)
+
+    def _cached(self, cache_key, load):
+        self._sync()
+        with self._cache_lock:
+            if cache_key in self._cache:
+                return self._cache[cache_key]
+            version = self._versions.get(cache_key, 0)
+        value = load(self._connection())
+        with self._cache_lock:
+            # Not cached when the key changed while loading: it may be stale.
+            if self._versions.get(cache_key, 0) == version:
+                self._cache[cache_key] = value
+        return value
+
+    def _write(self, write, cache_updates=(), invalidate=(), changed=()):
+        changed_keys = [cache_key for cache_key, _ in cache_updates] + list(invalidate) + list(changed)
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                result = write(conn)
+                if changed_keys:
+                    seq = conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM versions").fetchone()[0]
+                    conn.executemany(
+                        "INSERT INTO versions (key, seq) VALUES (?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET seq = excluded.seq",
+                        [(json.dumps(cache_key), seq) for cache_key in changed_keys]
+                    )
+                    # Before the commit, so _sync never sees this seq unmarked.
+                    with self._cache_lock:
+                        self._own_seqs.add(seq)
+            with self._cache_lock:
+                for cache_key in changed_keys:
+                    self._changed(cache_key)
+                for cache_key, value in cache_updates:
+                    self._cache[cache_key] = value
+            return result
+
+    # Key/value state (last played, Spotify token, ...)
+
+    def get(self, key, default=None):
+        def load(conn):
+            row = conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+            return json.loads(row[0]) if row else None
+
+        value = self._cached(("kv", key), load)
+        return default if value is None else value
+
+    def set(self, key, value):
+        self._write(
+            lambda conn: conn.execute(
+                "INSERT INTO kv (key, value, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                (key, json.dumps(value), time.time())
+            ),
+            [(("kv", key), value)]
+        )
+
+    def delete(self, key):
+        self._write(
+            lambda conn: conn.execute("DELETE FROM kv WHERE key = ?", (key,)),
+            [(("kv", key), None)]
+        )
+
+    # Favorites
+
+    def favorites(self):
+        def load(conn):
+            rows = conn.execute("SELECT data FROM favorites ORDER BY position").fetchall()
+            return [json.loads(row[0]) for row in rows]
+
+        return list(self._cached(("favorites",), load))
+
+    def replace_favorites(self, favorites):
+        favorites = [f for f in favorites if f.get("url")]
+
+        def write(conn):
+            conn.execute("DELETE FROM favorites")
+            conn.executemany(
+                "INSERT OR IGNORE INTO favorites (url, position, data) VALUES (?, ?, ?)",
+                [(f["url"], position, json.dumps(f)) for position, f in enumerate(favorites)]
+            )
+
+        self._write(write, [(("favorites",), list(favorites))])
+
+    # Play history
+
+    def add_history(self, url, name, playback_url=None):
+        def write(conn):
+            conn.execute(
+                "INSERT INTO play_history (played_at, url, name, playback_url) VALUES (?, ?, ?, ?)",
+                (time.time(), url, name, playback_url)
+            )
+            conn.execute(
+                "DELETE FROM play_history WHERE id <= "
+                "(SELECT id FROM play_history ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (STATE_HISTORY_MAX_ROWS,)
+            )
+
+        self._write(write, invalidate=[("history",)])
+
+    def history(self, limit=50):
+        def load(conn):
+            rows = conn.execute(
+                "SELECT played_at, url, name, playback_url FROM play_history ORDER BY id DESC LIMIT ?",
+                (STATE_HISTORY_MAX_ROWS,)
+            ).fetchall()
+            return [
+                {"played_at": played_at, "url": url, "name": name, "playback_url": playback_url}
+                for played_at, url, name, playback_url in rows
+            ]
+
+        return self._cached(("history",), load)[:limit]
+
+    # Persistent caches with expiry (catalogs, API responses)
+
+    def cache_get(self, namespace, key):
+        def load(conn):
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            return (json.loads(row[0]), row[1]) if row else None
+
+        entry = self._cached(("cache", namespace, key), load)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def cache_set(self, namespace, key, value, ttl):
+        expires_at = time.time() + ttl
+        self._write(
+            lambda conn: conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), expires_at)
+            ),
+            [(("cache", namespace, key), (value, expires_at))]
+        )
+
+    def cache_delete(self, namespace, key):
+        self._write(
+            lambda conn: conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key)
+            ),
+            [(("cache", namespace, key), None)]
+        )
+
+    def cache_clear(self, namespace):
+        self._write(
+            lambda conn: conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,)),
+            changed=[("cache", namespace)]
+        )
+
+    # Leases (which worker process runs a background job). Lease writes touch
+    # no cached keys, so renewals never invalidate anything.
+
+    def try_lease(self, name, owner, ttl):
+        """Take the named lease if it is free or expired, or renew it; True when owner holds it."""
+        now = time.time()
+        return self._write(lambda conn: conn.execute(
+            "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+            (name, owner, now + ttl, now)
+        ).rowcount == 1)
+
+    def release_lease(self, name, owner):
+        self._write(lambda conn: conn.execute(
+            "DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner)
+        ))
+
+    def migrate_json_files(self):
+        """Import favorites.json, last_played.json and spotify_tokens.json once."""
+        if self.get("migrated_json_files"):
+            return
+
+        def read_json(path):
+            try:
+                with open(path, "r") as f:
+                    return json.load(f)
+            except FileNotFoundError:
+                return None
+            except Exception as e:
+                log_event("state", "warning", "Skipping unreadable {path} during migration: {error}", path=path, error=e)
+                return None
+
+        favorites = read_json(FAVORITES_FILE)
+        if isinstance(favorites, list) and not self.favorites():
+            self.replace_favorites(favorites)
+        last_played = read_json(LAST_PLAYED_FILE)
+        if isinstance(last_played, dict) and last_played.get("url") and not self.get("last_played"):
+            self.set("last_played", last_played)
+        spotify_token = read_json(SPOTIFY_TOKENS_FILE)
+        if isinstance(spotify_token, dict) and not self.get("spotify_token"):
+            self.set("spotify_token", spotify_token)
+
+        self.set("migrated_json_files", time.time())
+        log_event("state", "debug", "Migrated JSON state files into {path}", path=self.path)
+
+STATE = StateStore(STATE_DB_FILE)
+STATE.migrate_json_files()
+
+# With several gunicorn workers, background jobs (AVR display pushes, station
+# catalog refreshes, Spotify token refreshes) must run in exactly one of them.
+# Every process keeps trying to take or renew a lease in the state database;
+# the holder is the leader. It considers itself leader only until one renew
+# interval before the lease expires, so two processes never overlap, and a
+# crashed leader is replaced within BACKGROUND_LEASE_TTL.
+BACKGROUND_LEASE_NAME = "background"
+BACKGROUND_LEASE_TTL = 30
+BACKGROUND_LEASE_RENEW_INTERVAL = 10
+
+class LeaderLease:
+    def __init__(self, state, name, ttl=BACKGROUND_LEASE_TTL, renew_interval=BACKGROUND_LEASE_RENEW_INTERVAL):
+        self.state = state
+        self.name = name
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._held_until = 0.0
+        self._started = False
+
+    def is_leader(self):
+        self.start()
+        return time.monotonic() < self._held_until
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            # The first answer is needed right away by whoever asked.
+            self._renew()
+
+        atexit.register(self.release)
+        threading.Thread(target=self._run, daemon=True, name=f"lease-{self.name}").start()
+
+    def release(self):
+        if time.monotonic() < self._held_until:
+            self._held_until = 0.0
+            try:
+                self.state.release_lease(self.name, self.owner)
+            except Exception as e:
+                log_event("state", "warning", "Failed to release {name} lease: {error}", name=self.name, error=e)
+
+    def _renew(self):
+        started = time.monotonic()
+        was_leader = started < self._held_until
+        try:
+            held = self.state.try_lease(self.name, self.owner, self.ttl)
+        except Exception as e:
+            log_event("state", "warning", "Failed to renew {name} lease: {error}", name=self.name, error=e)
+            held = False
+
+        self._held_until = started + self.ttl - self.renew_interval if held else 0.0
+        if held != was_leader:
+            log_event("state", "info", "Process {owner} {change} the {name} jobs", owner=self.owner, change="now runs" if held else "no longer runs", name=self.name)
+
+    def _run(self):
+        while True:
+            time.sleep(self.renew_interval)
+            self._renew()
+
+BACKGROUND_LEADER = LeaderLease(STATE, BACKGROUND_LEASE_NAME)
+
+def is_background_leader():
+    return BACKGROUND_LEADER.is_leader()
+
+# Last played is authoritative in memory; the state store only gets a
+# debounced copy, so zapping through stations costs one write, and status
+# polls and the display worker never wait on storage. Stations recorded by
+# other worker processes are picked up once their write lands.
+LAST_PLAYED_WRITE_DELAY = 2.0
+LAST_PLAYED_RECENT_MAX = 10
+
+class LastPlayedTracker:
+    """Last played station plus a most-recently-used station list."""
+
+    def __init__(self, state):
+        self.state = state
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._version = None
+        self._current = None
+        self._recent = []
+        self._pending_history = []
+        self._flush_timer = None
+
+    def _ensure_loaded(self):
+        if self._loaded and (self._pending_history or self._stored_version() == self._version):
+            return
+        try:
+            self._current = self.state.get("last_played")
+            self._recent = self.state.get("recent_stations") or (
+                [self._current] if self._current else []
+            )
+        except Exception as e:
+            log_event("state", "warning", "Failed to load last played: {error}", error=e)
+        self._version = self._stored_version()
+        self._loaded = True
+
+    def _stored_version(self):
+        # Only these keys matter; other writes (leases, caches) do not reload.
+        return (self.state.version(("kv", "last_played")), self.state.version(("kv", "recent_stations")))
+
+    def get(self):
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._current) if self._current else None
+
+    def recent(self):
+        with self._lock:
+            self._ensure_loaded()
+            return [dict(station) for station in self._recent]
+
+    def record(self, url, name, playback_url=None):
         data = {"url": url, "name": name}
         if playback_url and playback_url != url:
             data["playback_url"] = playback_url
-        with open(LAST_PLAYED_FILE, "w") as f:
-            json.dump(data, f)
-    except Exception as e:
-        log_debug(f"Failed to save last played: {e}")
+
+        with self._lock:
+            self._ensure_loaded()
+            self._current = data
+            self._recent = [data] + [s for s in self._recent if s.get("url") != url]
+            del self._recent[LAST_PLAYED_RECENT_MAX:]
+            self._pending_history.append(data)
+
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(LAST_PLAYED_WRITE_DELAY, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._flush_timer = None
+            if not self._pending_history:
+                return
+            current, recent = self._current, list(self._recent)
+            history, self._pending_history = self._pending_history, []
+
+        try:
+            self.state.set("last_played", current)
+            self.state.set("recent_stations", recent)
+            for entry in history:
+                self.state.add_history(entry["url"], entry["name"], entry.get("playback_url"))
+        except Exception as e:
+            log_event("state", "warning", "Failed to save last played: {error}", error=e)
+
+LAST_PLAYED = LastPlayedTracker(STATE)
+atexit.register(LAST_PLAYED.flush)
+
+def save_last_played(url, name, playback_url=None):
+    LAST_PLAYED.record(url, name, playback_url)
 
 def get_last_played():
-    try:
-        if os.path.exists(LAST_PLAYED_FILE):
-             with open(LAST_PLAYED_FILE, "r") as f:
-                 return json.load(f)
-    except Exception as e:
-        log_debug(f"Failed to load last played: {e}")
-    return None
+    return LAST_PLAYED.get()
 
 def normalize_now_playing(value):
     if not value:
@@ -174,10 +1045,10 @@ def get_playback_url(stream_url):
         local_ip = get_local_ip()
 
     host_port = os.getenv("HOST_PORT", "5000")
-    log_debug(f"Detected Local IP: {local_ip}, Port: {host_port}")
+    log_event("stream", "debug", "Detected Local IP: {local_ip}, Port: {host_port}", local_ip=local_ip, host_port=host_port)
 
     proxy_url = f"http://{local_ip}:{host_port}/stream.mp3?url={quote(stream_url, safe='')}"
-    log_debug(f"Rewriting HTTPS url to HTTP Proxy: {proxy_url}")
+    log_event("stream", "debug", "Rewriting HTTPS url to HTTP Proxy: {proxy_url}", proxy_url=proxy_url)
     return proxy_url
 
 def get_denon_display_title(station_name, now_playing=None):
@@ -213,19 +1084,21 @@ def send_avr_command(command):
     """Send command to AVR via HTTP API"""
     try:
         url = f"http://{DENON_IP}/goform/formiPhoneAppDirect.xml?{command}"
-        log_debug(f"Sending command: {url}")
-        resp = requests.get(url, timeout=2)
+        log_event("avr", "debug", "Sending command: {url}", url=url)
+        with observe_seconds(AVR_HTTP_SECONDS, "command"):
+            resp = requests.get(url, timeout=2)
         return resp.status_code == 200
     except Exception as e:
-        log_debug(f"Command failed: {e}")
+        log_event("avr", "warning", "Command failed: {error}", error=e)
         return False
 
 def get_avr_status():
     """Get AVR status via HTTP API"""
     try:
         url = f"http://{DENON_IP}/goform/formMainZone_MainZoneXml.xml"
-        log_debug(f"Getting status from: {url}")
-        resp = requests.get(url, timeout=2)
+        log_event("avr", "debug", "Getting status from: {url}", url=url)
+        with observe_seconds(AVR_HTTP_SECONDS, "status"):
+            resp = requests.get(url, timeout=2)
 
         if resp.status_code != 200:
             return None
@@ -248,23 +1121,23 @@ def get_avr_status():
             "name": "denon"
         }
     except Exception as e:
-        log_debug(f"Failed to get status: {e}")
+        log_event("avr", "warning", "Failed to get status: {error}", error=e)
         return None
 
 def is_avr_ready_for_radio_metadata_update():
     status = get_avr_status()
     if not status:
-        log_debug("Skipping Denon display metadata update: AVR status unavailable")
+        log_event("display", "debug", "Skipping Denon display metadata update: AVR status unavailable")
         return False
 
     power_on = status.get("power") == "ON" or status.get("state") == "on"
     if not power_on:
-        log_debug("Skipping Denon display metadata update: AVR is in standby")
+        log_event("display", "debug", "Skipping Denon display metadata update: AVR is in standby")
         return False
 
     source = status.get("source")
     if source not in RADIO_SOURCES:
-        log_debug(f"Skipping Denon display metadata update: AVR source is {source}")
+        log_event("display", "debug", "Skipping Denon display metadata update: AVR source is {source}", source=source)
         return False
 
     return True
@@ -279,10 +1152,10 @@ def add_home_assistant_cors_headers(response):
 
     if "*" in HOME_ASSISTANT_CORS_ORIGINS:
         response.headers["Access-Control-Allow-Origin"] = origin or "*"
-        response.headers["Vary"] = "Origin"
+        response.vary.add("Origin")
     elif origin in HOME_ASSISTANT_CORS_ORIGINS:
         response.headers["Access-Control-Allow-Origin"] = origin
-        response.headers["Vary"] = "Origin"
+        response.vary.add("Origin")
 
     if response.headers.get("Access-Control-Allow-Origin"):
         response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
@@ -313,22 +1186,118 @@ def status():
 
 
 
-import json
+# How often favorites.json is stat()ed to pick up edits made by hand.
+FAVORITES_STAT_INTERVAL = 1.0
 
-FAVORITES_FILE = 'favorites.json'
+class FavoritesStore:
+    """
+    Favorites from the state store, kept in memory with a URL and a vTuner
+    station id index that are rebuilt only when the stored list changes.
+    Every change is also exported (atomically) to favorites.json, and a
+    hand-edited favorites.json is imported again when its mtime moves.
+    """
+
+    def __init__(self, state, export_path):
+        self.state = state
+        self.export_path = export_path
+        self._lock = threading.RLock()
+        self._favorites = []
+        self._by_url = {}
+        self._by_id = {}
+        self._version = None
+        self._checked_at = None
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.export_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _set(self, favorites):
+        self._favorites = favorites
+        self._by_url = {f['url']: f for f in favorites if f.get('url')}
+        self._by_id = {favorite_station_id(f): f for f in self._by_url.values()}
+
+    def _import_hand_edits(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < FAVORITES_STAT_INTERVAL:
+            return
+        self._checked_at = now
+
+        mtime = self._file_mtime()
+        if mtime is None or mtime == self.state.get("favorites_export_mtime"):
+            return
+
+        try:
+            with open(self.export_path, 'r') as f:
+                favorites = json.load(f)
+        except Exception as e:
+            log_event("state", "warning", "Ignoring unreadable {export_path}: {error}", export_path=self.export_path, error=e)
+            return
+
+        if isinstance(favorites, list):
+            log_event("state", "debug", "Importing {count} favorites edited in {export_path}", count=len(favorites), export_path=self.export_path)
+            self.state.replace_favorites(favorites)
+        self.state.set("favorites_export_mtime", mtime)
+
+    def _refresh(self):
+        self._import_hand_edits()
+        version = self.state.version(("favorites",))
+        if version != self._version:
+            self._set(self.state.favorites())
+            self._version = version
+
+    def _write(self, favorites):
+        self.state.replace_favorites(favorites)
+        self._set(favorites)
+        try:
+            write_json_atomic(self.export_path, favorites, indent=2)
+            self.state.set("favorites_export_mtime", self._file_mtime())
+        except Exception as e:
+            log_event("state", "warning", "Failed to export favorites to {export_path}: {error}", export_path=self.export_path, error=e)
+        self._version = self.state.version(("favorites",))
+
+    def all(self):
+        with self._lock:
+            self._refresh()
+            return list(self._favorites)
+
+    def get_by_url(self, url):
+        with self._lock:
+            self._refresh()
+            return self._by_url.get(url)
+
+    def get_by_station_id(self, station_id):
+        with self._lock:
+            self._refresh()
+            return self._by_id.get(station_id)
+
+    def add(self, favorite):
+        """Append unless the URL is already a favorite; returns the new list."""
+        with self._lock:
+            self._refresh()
+            if favorite['url'] not in self._by_url:
+                self._write(self._favorites + [favorite])
+            return list(self._favorites)
+
+    def remove(self, url):
+        with self._lock:
+            self._refresh()
+            if url in self._by_url:
+                self._write([f for f in self._favorites if f['url'] != url])
+            return list(self._favorites)
+
+    def replace(self, favorites):
+        with self._lock:
+            self._write(list(favorites))
+
+FAVORITES = FavoritesStore(STATE, FAVORITES_FILE)
 
 def load_favorites():
-    if not os.path.exists(FAVORITES_FILE):
-        return []
-    try:
-        with open(FAVORITES_FILE, 'r') as f:
-            return json.load(f)
-    except:
-        return []
+    return FAVORITES.all()
 
 def save_favorites(favs):
-    with open(FAVORITES_FILE, 'w') as f:
-        json.dump(favs, f, indent=2)
+    FAVORITES.replace(favs)
 
 @app.route('/api/favorites', methods=['GET'])
 def list_favorites():
@@ -341,12 +1310,8 @@ def add_favorite():
     if not data or 'url' not in data or 'name' not in data:
         return jsonify({"error": "Missing name or url"}), 400
 
-    favs = load_favorites()
-    # Avoid duplicates by URL
-    if not any(f['url'] == data['url'] for f in favs):
-        favs.append(data)
-        save_favorites(favs)
-
+    # Duplicates (by URL) are ignored
+    favs = FAVORITES.add(data)
     return jsonify({"status": "success", "favorites": favs})
 
 @app.route('/api/favorites/delete', methods=['POST'])
@@ -356,9 +1321,7 @@ def delete_favorite():
     if not url:
         return jsonify({"error": "Missing url"}), 400
 
-    favs = load_favorites()
-    favs = [f for f in favs if f['url'] != url]
-    save_favorites(favs)
+    favs = FAVORITES.remove(url)
     return jsonify({"status": "success", "favorites": favs})
 
 @app.route('/api/volume', methods=['POST'])
@@ -367,7 +1330,7 @@ def set_volume():
     try:
         val = data.get('volume')
         if val is not None:
-            log_debug(f"Setting volume to {val}")
+            log_event("avr", "debug", "Setting volume to {val}", val=val)
             # Convert to Denon format: -80 to +18 becomes 00 to 98
             # Example: -30 dB = MV50 (Absolute 50)
             denon_vol = int(float(val) + 80)
@@ -377,7 +1340,7 @@ def set_volume():
             return jsonify({"error": "Failed to set volume"}), 500
         return jsonify({"error": "Missing volume"}), 400
     except Exception as e:
-        log_debug(f"Error setting volume: {e}")
+        log_event("avr", "warning", "Error setting volume: {error}", error=e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/input', methods=['POST'])
@@ -417,12 +1380,12 @@ def set_input():
             clean_source = source.strip()
             final_source = INPUT_MAPPING.get(clean_source, clean_source)
 
-            log_debug(f"Input selection requested: {source} -> {final_source}")
+            log_event("avr", "debug", "Input selection requested: {source} -> {final_source}", source=source, final_source=final_source)
 
             # Try HTTP API first (most reliable for Denon AVRs)
             http_success = False
             try:
-                log_debug(f"Attempting HTTP API method...")
+                log_event("avr", "debug", "Attempting HTTP API method...")
                 # The AVR's HTTP API expects commands like SICD, SISATCBL, etc.
                 # However, SAT/CBL requires the slash: SISAT/CBL
                 http_code = final_source.replace(" ", "")
@@ -431,15 +1394,16 @@ def set_input():
                     http_code = http_code.replace("/", "")
 
                 url = f"http://{DENON_IP}/goform/formiPhoneAppDirect.xml?SI{http_code}"
-                log_debug(f"HTTP API URL: {url}")
-                resp = requests.get(url, timeout=2)
+                log_event("avr", "debug", "HTTP API URL: {url}", url=url)
+                with observe_seconds(AVR_HTTP_SECONDS, "set_input"):
+                    resp = requests.get(url, timeout=2)
                 if resp.status_code == 200:
                     http_success = True
-                    log_debug(f"Successfully set input via HTTP API")
+                    log_event("avr", "debug", "Successfully set input via HTTP API")
                 else:
-                    log_debug(f"HTTP API returned status {resp.status_code}")
+                    log_event("avr", "debug", "HTTP API returned status {status_code}", status_code=resp.status_code)
             except Exception as http_err:
-                log_debug(f"HTTP API failed: {http_err}")
+                log_event("avr", "warning", "HTTP API failed: {error}", error=http_err)
 
 
 
@@ -451,13 +1415,13 @@ def set_input():
             return jsonify({"status": "success", "input": final_source, "method": "http"})
         return jsonify({"error": "Missing input"}), 400
     except Exception as e:
-        log_debug(f"Error setting input: {e}")
+        log_event("avr", "warning", "Error setting input: {error}", error=e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/mute/toggle', methods=['POST'])
 def toggle_mute():
     try:
-        log_debug("Toggling mute")
+        log_event("avr", "debug", "Toggling mute")
         # Get current status to determine mute state
         status = get_avr_status()
         if status is None:
@@ -470,36 +1434,39 @@ def toggle_mute():
             return jsonify({"status": "success", "muted": not current_muted})
         return jsonify({"error": "Failed to toggle mute"}), 500
     except Exception as e:
-        log_debug(f"Error toggling mute: {e}")
+        log_event("avr", "warning", "Error toggling mute: {error}", error=e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/power/on', methods=['POST'])
 def power_on():
     try:
-        log_debug("Turning power on (main zone)")
+        log_event("avr", "debug", "Turning power on (main zone)")
         if send_avr_command("ZMON"):
             return jsonify({"status": "success"})
         return jsonify({"error": "Failed to turn on"}), 500
     except Exception as e:
-        log_debug(f"Error turning on: {e}")
+        log_event("avr", "warning", "Error turning on: {error}", error=e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/power/off', methods=['POST'])
 def power_off():
     try:
-        log_debug("Turning power off")
+        log_event("avr", "debug", "Turning power off")
         if send_avr_command("PWSTANDBY"):
             return jsonify({"status": "success"})
         return jsonify({"error": "Failed to turn off"}), 500
     except Exception as e:
-        log_debug(f"Error turning off: {e}")
+        log_event("avr", "warning", "Error turning off: {error}", error=e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/stream.mp3')
-def stream_proxy():
+@app.route('/timeshift/<int:join>/stream.mp3')
+@app.route('/timeshift/resume/<string(maxlength=64):client_id>/stream.mp3')
+def stream_proxy(join=None, client_id=None):
     """
     Proxy HTTPS streams to HTTP for older AVRs.
     Exposed as .mp3 to satisfy DLNA requirements.
+    With time-shift enabled, served from the station's ring buffer.
     """
     # Extract the full URL from the original request line to avoid breaking URLs with query parameters
     # request.args.get('url') will truncate at the first '&' in the target URL.
@@ -513,7 +1480,13 @@ def stream_proxy():
         return "Missing url", 400
 
     try:
-        log_debug(f"Streaming proxy requested for: {url}")
+        log_event("stream", "debug", "Streaming proxy requested for: {url}", url=url)
+
+        if TIMESHIFT_MINUTES:
+            resp = timeshift_stream_response(url, join, client_id)
+            if resp is not None:
+                return add_dlna_stream_headers(resp)
+            log_event("stream", "warning", "All time-shift buffers are in use, relaying {url} live", url=url)
 
         # ICY (Shoutcast) metadata pass-through: only when the client (the AVR)
         # explicitly asks for it with Icy-MetaData: 1, request it upstream and
@@ -531,7 +1504,12 @@ def stream_proxy():
         if client_wants_icy:
             upstream_headers['Icy-MetaData'] = '1'
 
-        req = requests.get(url, headers=upstream_headers, stream=True, timeout=10)
+        started = time.monotonic()
+        try:
+            req = requests.get(url, headers=upstream_headers, stream=True, timeout=10)
+        except Exception:
+            STREAM_UPSTREAM_ERRORS.inc()
+            raise
 
         try:
             icy_metaint = int(req.headers.get('icy-metaint', 0))
@@ -539,15 +1517,28 @@ def stream_proxy():
             icy_metaint = 0
         icy_enabled = client_wants_icy and icy_metaint > 0
 
-        log_debug(
-            f"Proxy client requested ICY: {client_wants_icy}, "
-            f"upstream icy-metaint: {icy_metaint}, pass-through: {icy_enabled}"
+        log_event(
+            "stream", "debug",
+            "Proxy client requested ICY: {client_wants_icy}, upstream icy-metaint: {icy_metaint}, pass-through: {icy_enabled}",
+            client_wants_icy=client_wants_icy, icy_metaint=icy_metaint, icy_enabled=icy_enabled
         )
 
         def generate():
-            # Increase chunk size to 32KB for better buffering
-            for chunk in req.iter_content(chunk_size=32768):
-                yield chunk
+            count_bytes = STREAM_RELAYED_BYTES.inc
+            STREAM_ACTIVE_LISTENERS.inc()
+            try:
+                # Increase chunk size to 32KB for better buffering
+                chunks = req.iter_content(chunk_size=32768)
+                first_chunk = next(chunks, b"")
+                STREAM_UPSTREAM_TTFB_SECONDS.observe(time.monotonic() - started)
+                count_bytes(amount=len(first_chunk))
+                yield first_chunk
+                for chunk in chunks:
+                    count_bytes(amount=len(chunk))
+                    yield chunk
+            finally:
+                STREAM_ACTIVE_LISTENERS.dec()
+                req.close()
 
         # Force audio/mpeg for compatibility
         resp = app.response_class(generate(), mimetype='audio/mpeg')
@@ -559,19 +1550,20 @@ def stream_proxy():
                 if icy_value:
                     resp.headers[icy_header] = icy_value
 
-        # Add DLNA headers
-        # MP3 profile, Streaming mode, Time-seek supported (OP=01) or not?
-        # For live streams OP=00 (no seek) is safer, but OP=01 is common.
-        # DLNA.ORG_FLAGS: Binary flags for available features.
-        resp.headers['ContentFeatures.dlna.org'] = 'DLNA.ORG_PN=MP3;DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=01700000000000000000000000000000'
-        resp.headers['TransferMode.dlna.org'] = 'Streaming'
-        resp.headers['DAAP-Server'] = 'iTunes/10.0' # Sometimes helps
-
-        return resp
+        return add_dlna_stream_headers(resp)
     except Exception as e:
-        log_debug(f"Proxy error: {e}")
+        log_event("stream", "warning", "Proxy error: {error}", error=e)
         return str(e), 500
 
+def add_dlna_stream_headers(resp):
+    # MP3 profile, Streaming mode, Time-seek supported (OP=01) or not?
+    # For live streams OP=00 (no seek) is safer, but OP=01 is common.
+    # DLNA.ORG_FLAGS: Binary flags for available features.
+    resp.headers['ContentFeatures.dlna.org'] = 'DLNA.ORG_PN=MP3;DLNA.ORG_OP=01;DLNA.ORG_CI=0;DLNA.ORG_FLAGS=01700000000000000000000000000000'
+    resp.headers['TransferMode.dlna.org'] = 'Streaming'
+    resp.headers['DAAP-Server'] = 'iTunes/10.0' # Sometimes helps
+    return resp
+
 def get_local_ip():
     """Try to determine the host IP reachable by the AVR."""
     # Best guess: connect to the AVR IP and see what our local IP is
@@ -631,6 +1623,7 @@ def parse_stream_title(meta_data):
 
     return None
 
+@traced("icy_metadata")
 def get_stream_metadata(stream_url):
     """
     Connect to stream, get headers, and try to read ICY metadata (StreamTitle).
@@ -686,7 +1679,7 @@ def get_stream_metadata(stream_url):
         return info
 
     except Exception as e:
-        log_debug(f"Metadata fetch error: {e}")
+        log_event("stream", "warning", "Metadata fetch error: {error}", error=e)
         return {}
     finally:
         if r:
@@ -707,6 +1700,7 @@ def api_radio_now_playing():
     schedule_denon_display_update(radio_state)
     return jsonify(radio_state)
 
+@traced("ssdp")
 def discover_upnp_location(timeout=3):
     """
     Discover the UPnP Location URL via SSDP.
@@ -739,10 +1733,11 @@ def discover_upnp_location(timeout=3):
             except socket.timeout:
                 break
     except Exception as e:
-        print(f"SSDP Discovery failed: {e}")
+        log_event("upnp", "error", "SSDP Discovery failed: {error}", error=e)
 
     return None
 
+@traced("upnp_description")
 def get_control_url(location_url):
     """
     Fetch description.xml and parse for AVTransport ControlURL.
@@ -768,7 +1763,7 @@ def get_control_url(location_url):
                 return urljoin(location_url, control_path)
 
     except Exception as e:
-        print(f"Failed to get control URL: {e}")
+        log_event("upnp", "error", "Failed to get control URL: {error}", error=e)
 
     return None
 
@@ -778,17 +1773,21 @@ def discover_avtransport_control_url():
     if _AV_TRANSPORT_CONTROL_URL:
         return _AV_TRANSPORT_CONTROL_URL
 
-    control_url = None
+    # Discovered by another worker process already?
+    control_url = STATE.cache_get("avtransport_control_url", DENON_IP)
+    if control_url:
+        _AV_TRANSPORT_CONTROL_URL = control_url
+        return control_url
 
-    log_debug(f"Discovering UPnP services for {DENON_IP}...")
+    log_event("upnp", "debug", "Discovering UPnP services for {denon_ip}...", denon_ip=DENON_IP)
     location = discover_upnp_location()
     if location:
-        log_debug(f"Found Device Description at: {location}")
+        log_event("upnp", "debug", "Found Device Description at: {location}", location=location)
         control_url = get_control_url(location)
-        log_debug(f"Discovered Control URL: {control_url}")
+        log_event("upnp", "info", "Discovered Control URL: {control_url}", control_url=control_url)
 
     if not control_url:
-        log_debug("SSDP failed or yielded no result. Starting manual scan...")
+        log_event("upnp", "debug", "SSDP failed or yielded no result. Starting manual scan...")
 
         common_ports = [8080, 80, 55000, 38067]
         desc_paths = ["/description.xml", "/upnp/desc/aios_device/aios_device.xml", "/DeviceDescription.xml"]
@@ -797,23 +1796,24 @@ def discover_avtransport_control_url():
             for path in desc_paths:
                 try:
                     test_url = f"http://{DENON_IP}:{port}{path}"
-                    log_debug(f"Scanning {test_url} ...")
+                    log_event("upnp", "debug", "Scanning {test_url} ...", test_url=test_url)
                     r = requests.get(test_url, timeout=1)
                     if r.status_code == 200:
-                        log_debug(f"Found description at {test_url}")
+                        log_event("upnp", "debug", "Found description at {test_url}", test_url=test_url)
                         control_url = get_control_url(test_url)
                         if control_url:
                             break
                 except Exception as e:
-                    log_debug(f"Scan error for {test_url}: {e}")
+                    log_event("upnp", "debug", "Scan error for {test_url}: {error}", test_url=test_url, error=e)
             if control_url:
                 break
 
         if not control_url:
-            log_debug("Manual scan failed. Trying fallback to port 8080 direct control...")
+            log_event("upnp", "debug", "Manual scan failed. Trying fallback to port 8080 direct control...")
             control_url = f"http://{DENON_IP}:8080/AVTransport/control"
 
     _AV_TRANSPORT_CONTROL_URL = control_url
+    STATE.cache_set("avtransport_control_url", DENON_IP, control_url, AV_TRANSPORT_CONTROL_URL_TTL)
     return control_url
 
 def clean_xml_text(value):
@@ -889,15 +1889,17 @@ def post_avtransport_action(control_url, action_name, arguments=None):
         if attempt:
             time.sleep(1)
         try:
-            resp = requests.post(control_url, data=soap_body, headers=headers, timeout=5)
+            with observe_seconds(SOAP_ACTION_SECONDS, action_name):
+                resp = requests.post(control_url, data=soap_body, headers=headers, timeout=5)
             break
         except requests.exceptions.ConnectionError as e:
-            log_debug(f"{action_name} connection error (attempt {attempt + 1}): {e}")
+            log_event("upnp", "warning", "{action_name} connection error (attempt {attempt}): {error}", action_name=action_name, attempt=attempt + 1, error=e)
             last_error = e
     else:
         raise last_error
 
-    log_debug(f"{action_name} Response: {resp.status_code} {resp.text}")
+    if event_enabled("debug"):
+        log_event("upnp", "debug", "{action_name} Response: {status_code} {text}", action_name=action_name, status_code=resp.status_code, text=resp.text)
     if resp.status_code >= 400:
         raise RuntimeError(f"{action_name} failed with HTTP {resp.status_code}")
 
@@ -906,14 +1908,14 @@ def post_avtransport_action(control_url, action_name, arguments=None):
 def send_set_avtransport_uri(control_url, playback_url, station_name, display_title=None, artist=None):
     didl_lite = build_didl_lite(playback_url, station_name, display_title, artist)
 
-    log_debug(f"Sending SetAVTransportURI to {control_url} with title: {display_title or station_name}")
+    log_event("upnp", "debug", "Sending SetAVTransportURI to {control_url} with title: {title}", control_url=control_url, title=display_title or station_name)
     return post_avtransport_action(control_url, "SetAVTransportURI", {
         "CurrentURI": clean_xml_text(playback_url),
         "CurrentURIMetaData": clean_xml_text(didl_lite)
     })
 
 def send_play(control_url):
-    log_debug(f"Sending Play to {control_url}...")
+    log_event("upnp", "debug", "Sending Play to {control_url}...", control_url=control_url)
     return post_avtransport_action(control_url, "Play", {"Speed": "1"})
 
 def send_avtransport_uri(control_url, playback_url, station_name, display_title=None, artist=None):
@@ -929,7 +1931,7 @@ def get_avr_transport_state(control_url):
         if node is not None and node.text:
             return node.text.strip()
     except Exception as e:
-        log_debug(f"GetTransportInfo failed: {e}")
+        log_event("upnp", "warning", "GetTransportInfo failed: {error}", error=e)
     return None
 
 def get_avr_displayed_title(control_url):
@@ -947,13 +1949,12 @@ def get_avr_displayed_title(control_url):
         if title is not None and title.text:
             return title.text.strip()
     except Exception as e:
-        log_debug(f"GetPositionInfo failed: {e}")
+        log_event("upnp", "warning", "GetPositionInfo failed: {error}", error=e)
     return None
 
 def remember_denon_display_update(playback_url, display_title):
-    _LAST_DENON_DISPLAY_UPDATE["url"] = playback_url
-    _LAST_DENON_DISPLAY_UPDATE["title"] = display_title
-    _LAST_DENON_DISPLAY_UPDATE["at"] = time.time()
+    # Shared through the state store: play_url may run in any worker process.
+    STATE.set("denon_display_update", {"url": playback_url, "title": display_title, "at": time.time()})
 
 def verify_denon_display_update(control_url, expected_title):
     """
@@ -966,22 +1967,22 @@ def verify_denon_display_update(control_url, expected_title):
 
     state = get_avr_transport_state(control_url)
     if state and state not in ("PLAYING", "TRANSITIONING"):
-        log_debug(f"AVR transport state is {state} after metadata update, sending Play to recover")
+        log_event("display", "debug", "AVR transport state is {state} after metadata update, sending Play to recover", state=state)
         try:
             send_play(control_url)
         except Exception as e:
-            log_debug(f"Failed to resume playback after metadata update: {e}")
+            log_event("display", "warning", "Failed to resume playback after metadata update: {error}", error=e)
 
     displayed_title = get_avr_displayed_title(control_url)
     if displayed_title is None:
-        log_debug("AVR does not report a track title, skipping display verification")
+        log_event("display", "debug", "AVR does not report a track title, skipping display verification")
         return True
 
     if displayed_title == expected_title:
-        log_debug(f"AVR display verified: {displayed_title}")
+        log_event("display", "debug", "AVR display verified: {displayed_title}", displayed_title=displayed_title)
         return True
 
-    log_debug(f"AVR display shows '{displayed_title}' instead of '{expected_title}'")
+    log_event("display", "debug", "AVR display shows '{displayed_title}' instead of '{expected_title}'", displayed_title=displayed_title, expected_title=expected_title)
     return False
 
 def maybe_update_denon_display(radio_state):
@@ -1000,10 +2001,11 @@ def maybe_update_denon_display(radio_state):
     if not playback_url:
         return
 
-    last_update_at = _LAST_DENON_DISPLAY_UPDATE.get("at") or 0
+    last_update = STATE.get("denon_display_update") or {}
+    last_update_at = last_update.get("at") or 0
     if (
-        _LAST_DENON_DISPLAY_UPDATE.get("url") == playback_url
-        and _LAST_DENON_DISPLAY_UPDATE.get("title") == display_title
+        last_update.get("url") == playback_url
+        and last_update.get("title") == display_title
     ):
         return
 
@@ -1027,12 +2029,12 @@ def maybe_update_denon_display(radio_state):
             if verify_denon_display_update(control_url, display_title):
                 return
 
-            log_debug(
-                f"AVR display update attempt {attempt}/{DENON_DISPLAY_METADATA_MAX_PUSH_ATTEMPTS} "
-                f"not confirmed for '{display_title}'"
+            log_event(
+                "display", "debug", "AVR display update attempt {attempt}/{attempts} not confirmed for '{title}'",
+                attempt=attempt, attempts=DENON_DISPLAY_METADATA_MAX_PUSH_ATTEMPTS, title=display_title
             )
     except Exception as e:
-        log_debug(f"Failed to update Denon display metadata: {e}")
+        log_event("display", "warning", "Failed to update Denon display metadata: {error}", error=e)
 
 def run_denon_display_update(radio_state):
     with _DENON_DISPLAY_UPDATE_LOCK:
@@ -1042,6 +2044,10 @@ def schedule_denon_display_update(radio_state):
     if not DENON_IP or not DENON_DISPLAY_METADATA or not DENON_DISPLAY_TRACK_PUSHES:
         return
 
+    # Other worker processes leave display pushes to the leader's worker.
+    if not is_background_leader():
+        return
+
     if _DENON_DISPLAY_UPDATE_LOCK.locked():
         return
 
@@ -1058,11 +2064,11 @@ def schedule_denon_display_update(radio_state):
 
 def denon_display_metadata_worker():
     sleep_seconds = DENON_DISPLAY_METADATA_POLL_INTERVAL
-    log_debug(f"Started Denon display metadata worker, poll interval={sleep_seconds}s")
+    log_event("display", "debug", "Started Denon display metadata worker, poll interval={sleep_seconds}s", sleep_seconds=sleep_seconds)
 
     while True:
         try:
-            if not get_last_played():
+            if not is_background_leader() or not get_last_played():
                 time.sleep(sleep_seconds)
                 continue
 
@@ -1075,7 +2081,7 @@ def denon_display_metadata_worker():
             if radio_state:
                 run_denon_display_update(radio_state)
         except Exception as e:
-            log_debug(f"Denon display metadata worker error: {e}")
+            log_event("display", "warning", "Denon display metadata worker error: {error}", error=e)
 
         time.sleep(sleep_seconds)
 
@@ -1097,10 +2103,6 @@ def start_denon_display_metadata_worker():
         thread.start()
         _DENON_DISPLAY_WORKER_STARTED = True
 
-@app.before_request
-def ensure_denon_display_metadata_worker():
-    start_denon_display_metadata_worker()
-
 @app.route('/api/search')
 def search_stations():
     query = request.args.get('name', '')
@@ -1108,21 +2110,22 @@ def search_stations():
         return jsonify([])
 
     try:
-        # Use a random RadioBrowser server via DNS round robin or hardcoded high avail one
-        # "de1.api.radio-browser.info" is usually reliable
-        url = "https://de1.api.radio-browser.info/json/stations/search"
-        params = {
-            'name': query,
-            'limit': 20,
-            'hidebroken': 'true',
-            'order': 'clickcount',
-            'reverse': 'true'
-        }
-        resp = requests.get(url, params=params, timeout=5)
-        return jsonify(resp.json())
+        return jsonify(find_stations(query, 20)[0])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/history')
+def api_history():
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), STATE_HISTORY_MAX_ROWS))
+    except (TypeError, ValueError):
+        limit = 50
+    return jsonify(STATE.history(limit))
+
+@app.route('/api/recent_stations')
+def api_recent_stations():
+    return jsonify(LAST_PLAYED.recent())
+
 @app.route('/api/last_played')
 def api_last_played():
     data = get_last_played()
@@ -1142,10 +2145,10 @@ def play_url():
         return jsonify({"error": "Missing 'url' parameter"}), 400
 
     try:
-        log_debug(f"play_url called with url={stream_url}")
+        log_event("upnp", "debug", "play_url called with url={stream_url}", stream_url=stream_url)
 
         control_url = discover_avtransport_control_url()
-        log_debug(f"Using Control URL: {control_url}")
+        log_event("upnp", "debug", "Using Control URL: {control_url}", control_url=control_url)
 
         playback_url = get_playback_url(stream_url)
         # Reading the current track only matters when it will be pushed to the
@@ -1167,55 +2170,697 @@ def play_url():
         # We can try to fetch the XML status commonly found at /goform/formNetAudio_StatusXml.xml
         try:
             status_url = f"http://{DENON_IP}/goform/formNetAudio_StatusXml.xml"
-            r = requests.get(status_url, timeout=2)
-            log_debug(f"AVR NetAudio Status: {r.text}")
+            with observe_seconds(AVR_HTTP_SECONDS, "net_audio_status"):
+                r = requests.get(status_url, timeout=2)
+            if event_enabled("debug"):
+                log_event("upnp", "debug", "AVR NetAudio Status: {text}", text=r.text)
         except Exception as e:
-            log_debug(f"Could not fetch NetAudio Status: {e}")
+            log_event("upnp", "warning", "Could not fetch NetAudio Status: {error}", error=e)
 
         save_last_played(stream_url, station_name, playback_url)
         return jsonify({"status": "success", "played": playback_url, "control_url": control_url, "display_title": display_title})
 
     except Exception as e:
-        log_debug(f"Error playing URL: {e}")
+        log_event("upnp", "warning", "Error playing URL: {error}", error=e)
         if DEBUG:
             import traceback
             traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
+# ============ STREAM TIME-SHIFT ============
+# Optional (TIMESHIFT_MINUTES > 0). /stream.mp3 then no longer opens one
+# upstream connection per client: one recorder per station writes the stream
+# into a fixed-size ring in a memory-mapped temporary file (unlinked right
+# away, so nothing is left behind), and every client reads from the ring at its
+# own position. A paused AVR that stops reading keeps its place; one that
+# reconnects can continue where it was instead of at "now" when it asks to.
+#   /stream.mp3?url=...                       live
+#   /timeshift/<seconds>/stream.mp3?url=...   join that far behind live
+#   /timeshift/resume/<id>/stream.mp3?url=... continue where the last
+#                                             connection with this id stopped
+#                                             (live on the first one)
+# Memory stays flat with any number of listeners: the ring lives in the page
+# cache, and each client only holds the chunk it is sending. Recording goes
+# on for the length of the buffer after the last client left. The ring stores
+# the plain audio, so time-shifted clients get no ICY pass-through.
+TIMESHIFT_MINUTES = max(0, get_env_int("TIMESHIFT_MINUTES", 0))
+TIMESHIFT_DIR = os.getenv("TIMESHIFT_DIR") or tempfile.gettempdir()
+# Rings are sized for this bitrate; lower bitrates fit more minutes.
+TIMESHIFT_MAX_KBPS = 320
+TIMESHIFT_MAX_STATIONS = max(1, get_env_int("TIMESHIFT_MAX_STATIONS", 2))
+TIMESHIFT_CHUNK_SIZE = 32768
+# Bytes still in socket buffers when a client disconnected were never played.
+TIMESHIFT_RESUME_REWIND_SECONDS = 2
+TIMESHIFT_RECONNECT_DELAY = 2
+TIMESHIFT_DEFAULT_KBPS = 128
+TIMESHIFT_WAIT = 1
+
+class TimeshiftRing:
+    """One station's recording: a ring of `size` bytes in a memory-mapped file."""
+
+    def __init__(self, url, size):
+        self.url = url
+        self.size = size
+        self.written = 0  # bytes ever written; byte p is at p % size
+        self.bytes_per_second = None
+        self.stopped = False
+        self.listeners = 0
+        self.last_left = time.monotonic()
+        self._resume_positions = {}  # client id -> position
+        self._views = 0  # memoryviews of the map held by the recorder and listeners
+        self._closed = False
+        self.started = Future()  # resolved once connected upstream
+        self._started = time.monotonic()
+        self._cond = threading.Condition()
+        self._file = tempfile.TemporaryFile(dir=TIMESHIFT_DIR, prefix="timeshift-")
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._upstream = None
+
+    def start(self):
+        """Connect upstream (errors propagate to the first client), then record in the background."""
+        self._upstream = self._connect()
+        threading.Thread(target=self._record, daemon=True, name="timeshift-recorder").start()
+
+    def _connect(self):
+        started = time.monotonic()
+        try:
+            response = requests.get(self.url, headers={"Accept-Encoding": "identity"}, stream=True, timeout=10)
+            response.raise_for_status()
+        except Exception:
+            STREAM_UPSTREAM_ERRORS.inc()
+            raise
+        STREAM_UPSTREAM_TTFB_SECONDS.observe(time.monotonic() - started)
+        try:
+            self.bytes_per_second = int(response.headers.get("icy-br", "").split(",")[0]) * 125
+        except ValueError:
+            pass
+        return response
+
+    def _idle(self):
+        return self.listeners == 0 and time.monotonic() - self.last_left > TIMESHIFT_MINUTES * 60
+
+    def _record(self):
+        view = self._open_view()
+        try:
+            while not self._idle():
+                try:
+                    if self._upstream is None:
+                        self._upstream = self._connect()
+                    offset = self.written % self.size
+                    count = self._upstream.raw.readinto(view[offset:min(offset + TIMESHIFT_CHUNK_SIZE, self.size)])
+                    if not count:
+                        raise ConnectionError("upstream closed the stream")
+                except Exception as e:
+                    log_event("stream", "warning", "Time-shift recording of {url} interrupted: {error}", url=self.url, error=e)
+                    if self._upstream is not None:
+                        self._upstream.close()
+                        self._upstream = None
+                    time.sleep(TIMESHIFT_RECONNECT_DELAY)
+                    continue
+                with self._cond:
+                    self.written += count
+                    self._cond.notify_all()
+        finally:
+            self._release_view(view)
+            if self._upstream is not None:
+                self._upstream.close()
+            with self._cond:
+                self.stopped = True
+                self._cond.notify_all()
+            TIMESHIFT_BUFFERS.discard(self)
+            log_event("stream", "debug", "Stopped time-shift recording of {url}", url=self.url)
+
+    def _open_view(self):
+        """A memoryview of the ring, or None once closed; pair with _release_view()."""
+        with self._cond:
+            if self._closed:
+                return None
+            self._views += 1
+            return memoryview(self._map)
+
+    def _release_view(self, view):
+        view.release()
+        with self._cond:
+            self._views -= 1
+            if self._closed and not self._views:
+                self._unmap()
+
+    def close(self):
+        """Unmap the ring now, or when the last recorder or listener view is released."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            if not self._views:
+                self._unmap()
+
+    def _unmap(self):
+        self._map.close()
+        self._file.close()
+
+    def rate(self):
+        if self.bytes_per_second:
+            return self.bytes_per_second
+        elapsed = time.monotonic() - self._started
+        if elapsed > 5 and self.written:
+            return self.written / elapsed
+        return TIMESHIFT_DEFAULT_KBPS * 125
+
+    def oldest(self):
+        return max(0, self.written - self.size)
+
+    def buffered_seconds(self):
+        return (self.written - self.oldest()) / self.rate()
+
+    def join_position(self, client_id=None, join=None):
+        """Where a new client starts: where `client_id` stopped, `join` seconds behind live, or live."""
+        with self._cond:
+            resume = self._resume_positions.pop(client_id, None) if client_id else None
+            if resume is not None:
+                position = resume - int(TIMESHIFT_RESUME_REWIND_SECONDS * self.rate())
+            elif join:
+                position = self.written - int(join * self.rate())
+            else:
+                position = self.written
+            return max(position, self.oldest())
+
+    def listen(self, client_id, position):
+        """Yield the stream from `position` on, one chunk at a time; with a
+        `client_id`, remember where it stopped for the next resume."""
+        view = self._open_view()
+        if view is None:  # the recording already stopped
+            return
+        with self._cond:
+            self.listeners += 1
+        try:
+            while True:
+                with self._cond:
+                    while self.written <= position and not self.stopped:
+                        self._cond.wait(TIMESHIFT_WAIT)
+                    if self.written <= position:
+                        return
+                    # A client too slow for the ring skips to its oldest data.
+                    position = max(position, self.oldest())
+                    available = self.written - position
+
+                offset = position % self.size
+                count = min(available, TIMESHIFT_CHUNK_SIZE, self.size - offset)
+                # The one copy WSGI needs: servers only write bytes (gunicorn
+                # raises TypeError for a memoryview), and the ring moves on.
+                chunk = view[offset:offset + count].tobytes()
+                # The recorder may have lapped this chunk while it was copied.
+                if self.written - position > self.size:
+                    continue
+                position += count
+                yield chunk
+        finally:
+            self._release_view(view)
+            with self._cond:
+                self.listeners -= 1
+                self.last_left = time.monotonic()
+                if client_id:
+                    oldest = self.oldest()
+                    # Positions the ring has already overwritten are useless.
+                    for other, other_position in list(self._resume_positions.items()):
+                        if other_position < oldest:
+                            del self._resume_positions[other]
+                    self._resume_positions[client_id] = position
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "listeners": self.listeners,
+            "buffered_seconds": round(self.buffered_seconds(), 1),
+            "buffer_bytes": self.size,
+            "bytes_recorded": self.written,
+            "kbps": round(self.rate() / 125),
+        }
+
+class TimeshiftBuffers:
+    """The running station recordings, at most TIMESHIFT_MAX_STATIONS."""
+
+    def __init__(self, max_stations):
+        self.max_stations = max_stations
+        self.size = TIMESHIFT_MINUTES * 60 * TIMESHIFT_MAX_KBPS * 125
+        self._rings = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """The recording of `url`, started if needed; None when all slots are busy."""
+        with self._lock:
+            ring = self._rings.get(url)
+            starting = ring is None or ring.stopped
+            if starting:
+                if len(self._rings) >= self.max_stations:
+                    # Give up the recording nobody has listened to for the longest.
+                    idle = [
+                        ring for ring in self._rings.values()
+                        if ring.listeners == 0 and ring.started.done()
+                    ]
+                    if not idle:
+                        return None
+                    evicted = min(idle, key=lambda ring: ring.last_left)
+                    evicted.last_left = float("-inf")  # its recorder stops after the current read
+                    del self._rings[evicted.url]
+
+                # Claim the slot now and connect outside the lock, so a slow
+                # station does not hold up clients of the others.
+                ring = self._rings[url] = TimeshiftRing(url, self.size)
+
+        if not starting:
+            ring.started.result()  # wait for, or re-raise, the first client's connect
+            return ring
+
+        try:
+            ring.start()
+        except Exception as e:
+            self.discard(ring)
+            ring.started.set_exception(e)
+            raise
+        ring.started.set_result(True)
+        log_event("stream", "info", "Started time-shift recording of {url}", url=url)
+        return ring
+
+    def discard(self, ring):
+        with self._lock:
+            if self._rings.get(ring.url) is ring:
+                del self._rings[ring.url]
+        ring.close()
+
+    def stats(self):
+        with self._lock:
+            rings = list(self._rings.values())
+        return [ring.stats() for ring in rings]
+
+TIMESHIFT_BUFFERS = TimeshiftBuffers(TIMESHIFT_MAX_STATIONS)
+
+def timeshift_stream_response(url, join=None, client_id=None):
+    """Serve `url` from its time-shift ring, or None to fall back to a plain relay."""
+    ring = TIMESHIFT_BUFFERS.get(url)
+    if ring is None:
+        return None
+
+    position = ring.join_position(client_id, join)
+
+    def generate():
+        count_bytes = STREAM_RELAYED_BYTES.inc
+        STREAM_ACTIVE_LISTENERS.inc()
+        try:
+            for chunk in ring.listen(client_id, position):
+                count_bytes(amount=len(chunk))
+                yield chunk
+        finally:
+            STREAM_ACTIVE_LISTENERS.dec()
+
+    return app.response_class(generate(), mimetype='audio/mpeg')
+
+@app.route('/api/timeshift')
+def timeshift_status():
+    """Running time-shift recordings"""
+    return jsonify({
+        "enabled": TIMESHIFT_MINUTES > 0,
+        "minutes": TIMESHIFT_MINUTES,
+        "stations": TIMESHIFT_BUFFERS.stats(),
+    })
+
+
 # ============ SPOTIFY INTEGRATION ============
 
+class StateSpotifyTokenCache(CacheHandler):
+    """Keeps the Spotify token in the state store instead of spotify_tokens.json."""
+
+    def get_cached_token(self):
+        return STATE.get("spotify_token")
+
+    def save_token_to_cache(self, token_info):
+        STATE.set("spotify_token", token_info)
+
 def get_spotify_oauth():
     """Create Spotify OAuth handler"""
-    if not SPOTIFY_CLIENT_ID or not SPOTIFY_CLIENT_SECRET or not SPOTIFY_REDIRECT_URI:
+    if not SPOTIFY_CONFIGURED:
         return None
     return SpotifyOAuth(
         client_id=SPOTIFY_CLIENT_ID,
         client_secret=SPOTIFY_CLIENT_SECRET,
         redirect_uri=SPOTIFY_REDIRECT_URI,
         scope=SPOTIFY_SCOPE,
-        cache_path=SPOTIFY_TOKENS_FILE
+        cache_handler=StateSpotifyTokenCache()
     )
 
-def get_spotify_client():
-    """Get authenticated Spotify client"""
-    sp_oauth = get_spotify_oauth()
-    if not sp_oauth:
-        return None
+# Refresh the access token this long before Spotify expires it.
+SPOTIFY_TOKEN_REFRESH_MARGIN = 300
+SPOTIFY_TOKEN_RETRY_INTERVAL = 30
+
+# Every Spotify Web API call goes through one gateway. A token bucket keeps
+# the overall request rate within budget; background calls (now-playing
+# polling, cache prefetches) leave a reserve for interactive ones and step
+# aside while an interactive call waits. A 429 pauses all calls for the
+# Retry-After period instead of letting every route run into it. Identical
+# GETs in flight at the same time share one request.
+SPOTIFY_RATE_PER_SECOND = 3
+SPOTIFY_RATE_BURST = 20
+SPOTIFY_BACKGROUND_RESERVE = 5
+SPOTIFY_INTERACTIVE_MAX_WAIT = 5   # longer waits fail fast with a 429
+SPOTIFY_BACKGROUND_MAX_WAIT = 60
+SPOTIFY_DEFAULT_RETRY_AFTER = 5
+SPOTIFY_PRIORITY_INTERACTIVE = "interactive"
+SPOTIFY_PRIORITY_BACKGROUND = "background"
+SPOTIFY_API_PREFIX = "https://api.spotify.com/v1/"
+SPOTIFY_ID_SEGMENT_RE = re.compile(r'^[0-9A-Za-z]{22}$')
+
+def spotify_endpoint_name(method, url):
+    """'GET playlists/{id}/tracks' style name for the per-endpoint counters."""
+    path = url.split("?", 1)[0]
+    if path.startswith(SPOTIFY_API_PREFIX):
+        path = path[len(SPOTIFY_API_PREFIX):]
+    segments = ["{id}" if SPOTIFY_ID_SEGMENT_RE.match(segment) else segment
+                for segment in path.strip("/").split("/")]
+    return f"{method} {'/'.join(segments)}"
+
+def is_spotify_rate_limit(error):
+    """A real 429 from Spotify. spotipy also reports exhausted urllib3
+    retries as 429 "Max Retries", but without any response headers."""
+    return error.http_status == 429 and bool(getattr(error, "headers", None))
+
+def spotify_retry_after(headers):
+    try:
+        return max(1, int((headers or {}).get("Retry-After")))
+    except (TypeError, ValueError):
+        return SPOTIFY_DEFAULT_RETRY_AFTER
+
+class _SpotifyFlight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SpotifyGateway:
+    """Request budget, 429 backoff, GET coalescing and counters for Spotify calls."""
+
+    def __init__(self, rate=SPOTIFY_RATE_PER_SECOND, burst=SPOTIFY_RATE_BURST,
+                 background_reserve=SPOTIFY_BACKGROUND_RESERVE):
+        self.rate = rate
+        self.burst = burst
+        self.background_reserve = background_reserve
+        self._cond = threading.Condition()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._interactive_waiting = 0
+        self._inflight = {}
+        self._stats = {}
+        self._local = threading.local()
+
+    def current_priority(self):
+        return getattr(self._local, "priority", SPOTIFY_PRIORITY_INTERACTIVE)
+
+    @contextmanager
+    def priority(self, level):
+        """Run the calls made by this thread in the block at the given priority."""
+        previous = self.current_priority()
+        self._local.priority = level
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def call(self, method, url, params, send):
+        endpoint = spotify_endpoint_name(method, url)
+        if method != "GET":
+            return self._send(endpoint, send)
+
+        key = (url, repr(sorted((params or {}).items())))
+        with self._cond:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _SpotifyFlight()
+
+        if not leader:
+            self._count(endpoint, "coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
 
-    token_info = sp_oauth.get_cached_token()
-    if not token_info:
-        return None
+        try:
+            flight.result = self._send(endpoint, send)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._cond:
+                del self._inflight[key]
+            flight.done.set()
+
+    def _send(self, endpoint, send):
+        self._acquire(endpoint)
+        started = time.monotonic()
+        try:
+            with observe_seconds(SPOTIFY_API_SECONDS, endpoint):
+                return send()
+        except SpotifyException as e:
+            if is_spotify_rate_limit(e):
+                retry_after = spotify_retry_after(e.headers)
+                log_event("spotify", "warning", "Spotify rate limited {endpoint}, pausing calls for {retry_after}s", endpoint=endpoint, retry_after=retry_after)
+                self._count(endpoint, "throttled")
+                with self._cond:
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+                    self._tokens = 0.0
+            else:
+                self._count(endpoint, "errors")
+            raise
+        finally:
+            self._count(endpoint, "calls", seconds=time.monotonic() - started)
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _acquire(self, endpoint):
+        interactive = self.current_priority() == SPOTIFY_PRIORITY_INTERACTIVE
+        max_wait = SPOTIFY_INTERACTIVE_MAX_WAIT if interactive else SPOTIFY_BACKGROUND_MAX_WAIT
+        needed = 1 if interactive else 1 + self.background_reserve
+        started = time.monotonic()
+        deadline = started + max_wait
+
+        with self._cond:
+            if interactive:
+                self._interactive_waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now < self._blocked_until:
+                        wait_for = self._blocked_until - now
+                    elif self._tokens < needed:
+                        wait_for = (needed - self._tokens) / self.rate
+                    elif not interactive and self._interactive_waiting:
+                        wait_for = 1 / self.rate
+                    else:
+                        self._tokens -= 1
+                        break
+
+                    if now + wait_for > deadline:
+                        self._count_locked(endpoint, "rejected")
+                        raise SpotifyException(
+                            429, -1, f"Spotify request budget exhausted for {endpoint}",
+                            headers={"Retry-After": str(math.ceil(wait_for))}
+                        )
+                    self._cond.wait(wait_for)
+            finally:
+                if interactive:
+                    self._interactive_waiting -= 1
+                    self._cond.notify_all()
+
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self._count(endpoint, "waited", seconds=waited)
+
+    def _count(self, endpoint, counter, seconds=None):
+        with self._cond:
+            self._count_locked(endpoint, counter, seconds)
+
+    def _count_locked(self, endpoint, counter, seconds=None):
+        stats = self._stats.setdefault(endpoint, Counter())
+        stats[counter] += 1
+        if seconds is not None:
+            stats[f"{counter}_seconds"] += seconds
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            endpoints = {
+                endpoint: {name: round(value, 3) if isinstance(value, float) else value
+                           for name, value in counters.items()}
+                for endpoint, counters in sorted(self._stats.items())
+            }
+            return {
+                "tokens": round(self._tokens, 1),
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "paused_for": round(max(0.0, self._blocked_until - now), 1),
+                "in_flight": len(self._inflight),
+                "endpoints": endpoints
+            }
+
+SPOTIFY_GATEWAY = SpotifyGateway()
+
+class GatewaySpotify(SpotifyClientBase):
+    """spotipy client whose every API call passes through SPOTIFY_GATEWAY."""
+
+    def _internal_call(self, method, url, payload, params):
+        parent = super(GatewaySpotify, self)._internal_call
+        return SPOTIFY_GATEWAY.call(method, url, params, lambda: parent(method, url, payload, params))
+
+def spotify_http_session():
+    """
+    HTTP session for the spotipy client. 5xx responses are retried as spotipy
+    would, but 429s never are: urllib3 would otherwise sleep through
+    Retry-After inside the call (respect_retry_after_header), bypassing the
+    gateway's pause, token bucket and priorities. When the 5xx retries run
+    out, the last response is returned (raise_on_status=False) so spotipy
+    reports it as that 5xx rather than as a header-less 429.
+    """
+    retry = Retry(
+        total=3,
+        connect=None,
+        read=False,
+        status=3,
+        backoff_factor=0.3,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]),
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class SpotifyClientManager:
+    """
+    One process-wide spotipy client (and thus one pooled HTTP session).
+    The token lives in memory and a background thread refreshes it shortly
+    before it expires, so requests never pay for a refresh or a token read.
+    Only the background leader refreshes; other worker processes pick the
+    new token (or a logout) up from the state store. Acts as the client's
+    auth manager.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._token_changed = threading.Event()
+        self._oauth = None
+        self._token = None
+        self._token_version = None
+        self._client = None
+        self._refresher_started = False
+
+    def oauth(self):
+        with self._lock:
+            if self._oauth is None:
+                self._oauth = get_spotify_oauth()
+            return self._oauth
+
+    def _shared_token(self):
+        # Caller holds self._lock. Reloads only when the stored token changed.
+        version = STATE.version(("kv", "spotify_token"))
+        if version != self._token_version:
+            self._token = STATE.get("spotify_token")
+            self._token_version = version
+        return self._token
+
+    def token_info(self):
+        with self._lock:
+            token = self._shared_token()
+
+        if token and SpotifyOAuth.is_token_expired(token):
+            # Only when the refresher could not keep up (e.g. host suspended).
+            log_event("spotify", "debug", "Spotify token expired, refreshing in the request")
+            token = self.refresh(token)
+        return token
+
+    def get_access_token(self, as_dict=False):
+        token = self.token_info()
+        if not token:
+            raise SpotifyOauthError("Not authenticated with Spotify")
+        return token if as_dict else token["access_token"]
+
+    def set_token(self, token_info):
+        with self._lock:
+            self._token = token_info
+            self._token_version = STATE.version(("kv", "spotify_token"))
+        self._token_changed.set()
+        if token_info:
+            self.start_refresher()
+
+    def refresh(self, token):
+        new_token = self.oauth().refresh_access_token(token["refresh_token"])
+        with self._lock:
+            self._token = new_token
+        return new_token
+
+    def client(self):
+        if self.oauth() is None or not self.token_info():
+            return None
+
+        self.start_refresher()
+        with self._lock:
+            if self._client is None:
+                self._client = GatewaySpotify(auth_manager=self, requests_session=spotify_http_session())
+            return self._client
+
+    def start_refresher(self):
+        with self._lock:
+            if self._refresher_started:
+                return
+            self._refresher_started = True
+
+        threading.Thread(target=self._refresh_worker, daemon=True, name="spotify-token").start()
+
+    def _refresh_worker(self):
+        while True:
+            self._token_changed.clear()
+            with self._lock:
+                token = self._shared_token()
+
+            if not token:
+                self._token_changed.wait(SPOTIFY_TOKEN_RETRY_INTERVAL)
+                continue
+
+            delay = token.get("expires_at", 0) - time.time() - SPOTIFY_TOKEN_REFRESH_MARGIN
+            if delay > 0:
+                self._token_changed.wait(delay)
+                continue
 
-    # Refresh if needed
-    if sp_oauth.is_token_expired(token_info):
-        token_info = sp_oauth.refresh_access_token(token_info['refresh_token'])
+            if not is_background_leader():
+                # The leader refreshes; its token shows up in the state store.
+                self._token_changed.wait(SPOTIFY_TOKEN_RETRY_INTERVAL)
+                continue
+
+            try:
+                self.refresh(token)
+                log_event("spotify", "debug", "Refreshed Spotify access token in the background")
+            except Exception as e:
+                log_event("spotify", "warning", "Spotify token refresh failed: {error}", error=e)
+                self._token_changed.wait(SPOTIFY_TOKEN_RETRY_INTERVAL)
+
+SPOTIFY = SpotifyClientManager()
 
-    return spotipy.Spotify(auth=token_info['access_token'])
+def get_spotify_client():
+    """Get the shared authenticated Spotify client, or None"""
+    return SPOTIFY.client()
 
 @app.route('/spotify/login')
 def spotify_login():
     """Initiate Spotify OAuth flow"""
-    sp_oauth = get_spotify_oauth()
+    sp_oauth = SPOTIFY.oauth()
     if not sp_oauth:
         return jsonify({"error": "Spotify not configured"}), 500
 
@@ -1225,7 +2870,7 @@ def spotify_login():
 @app.route('/spotify/callback')
 def spotify_callback():
     """Handle Spotify OAuth callback"""
-    sp_oauth = get_spotify_oauth()
+    sp_oauth = SPOTIFY.oauth()
     if not sp_oauth:
         return jsonify({"error": "Spotify not configured"}), 500
 
@@ -1234,12 +2879,13 @@ def spotify_callback():
         return jsonify({"error": "No authorization code provided"}), 400
 
     try:
-        token_info = sp_oauth.get_access_token(code)
+        sp_oauth.get_access_token(code)
+        SPOTIFY.set_token(STATE.get("spotify_token"))
         session['spotify_authed'] = True
-        log_debug("Spotify authentication successful")
+        log_event("spotify", "info", "Spotify authentication successful")
         return redirect('/')
     except Exception as e:
-        log_debug(f"Spotify auth error: {e}")
+        log_event("spotify", "warning", "Spotify auth error: {error}", error=e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/spotify/status')
@@ -1264,6 +2910,10 @@ def spotify_status():
 def spotify_logout():
     """Clear Spotify authentication"""
     try:
+        STATE.delete("spotify_token")
+        SPOTIFY.set_token(None)
+        STATE.cache_clear("spotify_playlists")
+        STATE.cache_clear("spotify_tracks")
         if os.path.exists(SPOTIFY_TOKENS_FILE):
             os.remove(SPOTIFY_TOKENS_FILE)
         session.pop('spotify_authed', None)
@@ -1271,6 +2921,279 @@ def spotify_logout():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Playlists and their tracks are cached in the state store. A playlist's
+# tracks are only fetched again when Spotify reports a new snapshot_id for
+# it; Liked Songs has no snapshot and is topped up by added_at instead.
+# Opening a playlist or Liked Songs (its first page, or the whole list)
+# checks once; the following pages of that open trust the check for
+# SPOTIFY_TRACKS_CHECK_INTERVAL.
+SPOTIFY_PLAYLISTS_CACHE_TTL = 300
+SPOTIFY_TRACKS_CACHE_TTL = 30 * 24 * 3600
+SPOTIFY_TRACKS_CHECK_INTERVAL = 300
+
+def format_spotify_playlist(item):
+    images = item.get('images') or []
+    return {
+        "id": item['id'],
+        "name": item['name'],
+        "uri": item['uri'],
+        "tracks_total": (item.get('tracks') or {}).get('total', 0),
+        "image_url": images[0]['url'] if images else None,
+        "owner": (item.get('owner') or {}).get('display_name'),
+        "snapshot_id": item.get('snapshot_id')
+    }
+
+def format_spotify_track(item):
+    track = item['track'] if 'track' in item else item
+    if not track:
+        return None
+
+    artists = ', '.join([artist['name'] for artist in track.get('artists', [])])
+    album_images = track.get('album', {}).get('images', [])
+    image_url = album_images[0]['url'] if album_images else None
+
+    formatted = {
+        "id": track['id'],
+        "name": track['name'],
+        "uri": track['uri'],
+        "artists": artists,
+        "album": track.get('album', {}).get('name', ''),
+        "duration_ms": track.get('duration_ms', 0),
+        "image_url": image_url
+    }
+    if item.get('added_at'):
+        formatted["added_at"] = item['added_at']
+    return formatted
+
+def collect_spotify_pages(sp, results, formatter, stop=None):
+    """Follow 'next' links one by one; stop(formatted_item) ends the walk early."""
+    items = []
+    while results:
+        for raw_item in results['items']:
+            formatted = formatter(raw_item)
+            if formatted is None:
+                continue
+            if stop and stop(formatted):
+                return items, True
+            items.append(formatted)
+
+        results = sp.next(results) if results['next'] else None
+    return items, False
+
+# Large collections: after the first page (which tells the total) the
+# remaining offsets are requested concurrently on this shared, bounded pool,
+# which also caps how hard all requests together can hit Spotify.
+SPOTIFY_PAGE_FETCH_WORKERS = 4
+_SPOTIFY_PAGE_EXECUTOR = register_thread_pool("spotify_pages", ThreadPoolExecutor(
+    max_workers=SPOTIFY_PAGE_FETCH_WORKERS,
+    thread_name_prefix="spotify-pages"
+))
+
+def iter_spotify_collection(fetch_page, page_size, formatter, first_page=None):
+    """
+    fetch_page(offset, limit) returns a Spotify paging object. Yields all
+    formatted items (None results dropped) in collection order, each page
+    as soon as it and the pages before it have arrived.
+    """
+    if first_page is None:
+        first_page = fetch_page(0, page_size)
+
+    offsets = range(len(first_page['items']), first_page.get('total') or 0, page_size)
+    pages = [first_page]
+    if offsets:
+        log_event("spotify", "debug", "Fetching {count} more Spotify pages in parallel", count=len(offsets))
+        priority = SPOTIFY_GATEWAY.current_priority()
+
+        def fetch_offset(offset):
+            with SPOTIFY_GATEWAY.priority(priority):
+                return fetch_page(offset, page_size)
+
+        pages = itertools.chain(pages, _SPOTIFY_PAGE_EXECUTOR.map(fetch_offset, offsets))
+
+    for page in pages:
+        for raw_item in page['items']:
+            formatted = formatter(raw_item)
+            if formatted is not None:
+                yield formatted
+
+def fetch_spotify_collection(fetch_page, page_size, formatter, first_page=None):
+    return list(iter_spotify_collection(fetch_page, page_size, formatter, first_page))
+
+def load_spotify_playlists(sp, refresh=False):
+    cached = None if refresh else STATE.cache_get("spotify_playlists", "all")
+    if cached is not None:
+        return cached
+
+    playlists = fetch_spotify_collection(
+        lambda offset, limit: sp.current_user_playlists(limit=limit, offset=offset),
+        50,
+        format_spotify_playlist
+    )
+
+    # Also get saved tracks/liked songs
+    try:
+        saved_tracks = sp.current_user_saved_tracks(limit=1)
+        if saved_tracks['total'] > 0:
+            playlists.insert(0, {
+                "id": "liked",
+                "name": "Liked Songs",
+                "uri": None,  # Special case
+                "tracks_total": saved_tracks['total'],
+                "image_url": None,
+                "owner": "You"
+            })
+    except Exception:
+        pass
+
+    STATE.cache_set("spotify_playlists", "all", playlists, SPOTIFY_PLAYLISTS_CACHE_TTL)
+    return playlists
+
+def current_playlist_snapshot(sp, playlist_id):
+    # Asked every time: the cached playlist list can be minutes old, and a
+    # stale snapshot_id would keep serving tracks that were since changed.
+    return sp.playlist(playlist_id, fields="snapshot_id").get("snapshot_id")
+
+def spotify_tracks_page_fetcher(sp, playlist_id):
+    """Return (fetch_page(offset, limit), max page size) for a playlist or Liked Songs."""
+    if playlist_id == "liked":
+        return lambda offset, limit: sp.current_user_saved_tracks(limit=limit, offset=offset), 50
+    return lambda offset, limit: sp.playlist_tracks(playlist_id, limit=limit, offset=offset), 100
+
+def cached_spotify_tracks(sp, playlist_id, revalidate=True):
+    """
+    Returns (tracks, snapshot_id): the complete, still valid track list if
+    one is cached, else None, and the live snapshot_id when it was fetched.
+    Without revalidate, a check made within SPOTIFY_TRACKS_CHECK_INTERVAL
+    (by the first page of the same open) is trusted.
+    """
+    cached = STATE.cache_get("spotify_tracks", playlist_id)
+    if cached is None:
+        return None, None
+    checked = STATE.cache_get("spotify_tracks_checked", playlist_id)
+    if not revalidate and checked is not None and checked["snapshot_id"] == cached.get("snapshot_id"):
+        return cached["tracks"], cached.get("snapshot_id")
+
+    if playlist_id == "liked":
+        return load_spotify_liked_tracks(sp), None
+
+    snapshot_id = current_playlist_snapshot(sp, playlist_id)
+    if snapshot_id and cached.get("snapshot_id") == snapshot_id:
+        log_event("spotify", "debug", "Playlist {playlist_id} unchanged (snapshot {snapshot_id}), serving cached tracks", playlist_id=playlist_id, snapshot_id=snapshot_id)
+        mark_spotify_tracks_checked(playlist_id, snapshot_id)
+        return cached["tracks"], snapshot_id
+    return None, snapshot_id
+
+def mark_spotify_tracks_checked(playlist_id, snapshot_id=None):
+    """Later pages of this open may serve the cached tracks without asking Spotify."""
+    STATE.cache_set("spotify_tracks_checked", playlist_id, {"snapshot_id": snapshot_id}, SPOTIFY_TRACKS_CHECK_INTERVAL)
+
+def iter_spotify_playlist_tracks(sp, playlist_id, snapshot_id=None):
+    """Yield a playlist's (or Liked Songs') tracks; a complete walk fills the
+    cache. A snapshot_id the caller just fetched skips the cache check."""
+    if snapshot_id is None:
+        tracks, snapshot_id = cached_spotify_tracks(sp, playlist_id)
+        if tracks is not None:
+            yield from tracks
+            return
+
+    if playlist_id != "liked" and snapshot_id is None:
+        snapshot_id = current_playlist_snapshot(sp, playlist_id)
+    fetch_page, page_size = spotify_tracks_page_fetcher(sp, playlist_id)
+    tracks = []
+    for track in iter_spotify_collection(fetch_page, page_size, format_spotify_track):
+        tracks.append(track)
+        yield track
+
+    if playlist_id == "liked":
+        store_spotify_liked_tracks(tracks)
+    elif snapshot_id:
+        STATE.cache_set("spotify_tracks", playlist_id, {
+            "snapshot_id": snapshot_id,
+            "tracks": tracks
+        }, SPOTIFY_TRACKS_CACHE_TTL)
+        mark_spotify_tracks_checked(playlist_id, snapshot_id)
+
+def load_spotify_playlist_tracks(sp, playlist_id, snapshot_id=None):
+    return list(iter_spotify_playlist_tracks(sp, playlist_id, snapshot_id))
+
+def fetch_spotify_tracks_window(sp, playlist_id, offset, limit):
+    """Fetch just tracks[offset:offset + limit] from Spotify; returns (tracks, total)."""
+    fetch_page, page_size = spotify_tracks_page_fetcher(sp, playlist_id)
+    tracks = []
+    total = 0
+    position = offset
+    while position < offset + limit:
+        page = fetch_page(position, min(page_size, offset + limit - position))
+        total = page.get('total') or 0
+        tracks.extend(t for t in map(format_spotify_track, page['items']) if t is not None)
+        position += len(page['items'])
+        if not page['items'] or position >= total:
+            break
+    return tracks, total
+
+_SPOTIFY_TRACK_PREFETCHES = set()
+_SPOTIFY_TRACK_PREFETCHES_LOCK = threading.Lock()
+
+def prefetch_spotify_tracks(sp, playlist_id, snapshot_id=None):
+    """Fill the track cache in the background so later pages are local."""
+    with _SPOTIFY_TRACK_PREFETCHES_LOCK:
+        if playlist_id in _SPOTIFY_TRACK_PREFETCHES:
+            return
+        _SPOTIFY_TRACK_PREFETCHES.add(playlist_id)
+
+    def run():
+        try:
+            with SPOTIFY_GATEWAY.priority(SPOTIFY_PRIORITY_BACKGROUND):
+                load_spotify_playlist_tracks(sp, playlist_id, snapshot_id)
+        except Exception as e:
+            log_event("spotify", "warning", "Prefetching tracks of {playlist_id} failed: {error}", playlist_id=playlist_id, error=e)
+        finally:
+            with _SPOTIFY_TRACK_PREFETCHES_LOCK:
+                _SPOTIFY_TRACK_PREFETCHES.discard(playlist_id)
+
+    threading.Thread(target=run, daemon=True, name="spotify-prefetch").start()
+
+def store_spotify_liked_tracks(tracks=None):
+    """Cache Liked Songs (when given) and mark them as checked just now."""
+    if tracks is not None:
+        STATE.cache_set("spotify_tracks", "liked", {"tracks": tracks}, SPOTIFY_TRACKS_CACHE_TTL)
+    mark_spotify_tracks_checked("liked")
+
+def load_spotify_liked_tracks(sp):
+    """
+    Saved tracks come newest first, so only the pages up to the newest
+    cached track are fetched. When the total does not add up afterwards
+    (tracks were removed), everything is fetched again.
+    """
+    cached = STATE.cache_get("spotify_tracks", "liked")
+    first_page = sp.current_user_saved_tracks(limit=50)
+    total = first_page.get('total', 0)
+
+    if cached and cached.get("tracks"):
+        newest = cached["tracks"][0]
+        known = (newest.get("added_at"), newest["uri"])
+        new_tracks, reached_cache = collect_spotify_pages(
+            sp, first_page, format_spotify_track,
+            stop=lambda track: (track.get("added_at"), track["uri"]) == known
+        )
+        tracks = new_tracks + cached["tracks"]
+        if reached_cache and len(tracks) == total:
+            if new_tracks:
+                log_event("spotify", "debug", "Liked Songs: {count} new tracks added to cache", count=len(new_tracks))
+            store_spotify_liked_tracks(tracks if new_tracks else None)
+            return tracks
+        log_event("spotify", "debug", "Liked Songs changed beyond new additions, fetching all again")
+        first_page = None
+
+    tracks = fetch_spotify_collection(
+        lambda offset, limit: sp.current_user_saved_tracks(limit=limit, offset=offset),
+        50,
+        format_spotify_track,
+        first_page=first_page
+    )
+    store_spotify_liked_tracks(tracks)
+    return tracks
+
 @app.route('/api/spotify/playlists')
 def spotify_playlists():
     """Get user's Spotify playlists"""
@@ -1279,48 +3202,10 @@ def spotify_playlists():
         return jsonify({"error": "Not authenticated"}), 401
 
     try:
-        playlists = []
-        results = sp.current_user_playlists(limit=50)
-
-        while results:
-            for item in results['items']:
-                # Get album art (first image, or None)
-                images = item.get('images', [])
-                image_url = images[0]['url'] if images else None
-
-                playlists.append({
-                    "id": item['id'],
-                    "name": item['name'],
-                    "uri": item['uri'],
-                    "tracks_total": item['tracks']['total'],
-                    "image_url": image_url,
-                    "owner": item['owner']['display_name']
-                })
-
-            # Get next page if available
-            if results['next']:
-                results = sp.next(results)
-            else:
-                results = None
-
-        # Also get saved tracks/liked songs
-        try:
-            saved_tracks = sp.current_user_saved_tracks(limit=1)
-            if saved_tracks['total'] > 0:
-                playlists.insert(0, {
-                    "id": "liked",
-                    "name": "Liked Songs",
-                    "uri": None,  # Special case
-                    "tracks_total": saved_tracks['total'],
-                    "image_url": None,
-                    "owner": "You"
-                })
-        except:
-            pass
-
-        return jsonify(playlists)
+        refresh = request.args.get('refresh', '').lower() in ("1", "true", "yes")
+        return jsonify(load_spotify_playlists(sp, refresh))
     except Exception as e:
-        log_debug(f"Error fetching playlists: {e}")
+        log_event("spotify", "warning", "Error fetching playlists: {error}", error=e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/spotify/recently_played_contexts')
@@ -1341,7 +3226,7 @@ def spotify_recently_played_contexts():
                     recent_contexts.append(uri)
         return jsonify({"recent_contexts": recent_contexts})
     except Exception as e:
-        log_debug(f"Error fetching recently played context: {e}")
+        log_event("spotify", "warning", "Error fetching recently played context: {error}", error=e)
         return jsonify({"error": str(e)}), 500
 
 SPOTIFY_SEARCH_TYPE_ALIASES = {
@@ -1377,134 +3262,231 @@ def first_image_url(images):
 
     return None
 
-@app.route('/api/spotify/search')
-def spotify_search():
-    """Search Spotify for songs, playlists, and podcast episodes."""
-    sp = get_spotify_client()
-    if not sp:
-        return jsonify({"error": "Not authenticated"}), 401
+def format_spotify_search_results(results):
+    """Flatten a sp.search() response into typed result items."""
+    items = []
 
-    query = request.args.get('q', '').strip()
-    if not query:
-        return jsonify([])
+    for track in results.get('tracks', {}).get('items', []):
+        if not track or not track.get('uri'):
+            continue
 
-    try:
-        limit = max(1, min(int(request.args.get('limit', 8)), 20))
-    except (TypeError, ValueError):
-        limit = 8
+        artists = ', '.join([artist['name'] for artist in track.get('artists', [])])
+        album_images = track.get('album', {}).get('images', [])
+        items.append({
+            "type": "track",
+            "label": "Song",
+            "id": track.get('id'),
+            "name": track.get('name'),
+            "subtitle": artists,
+            "uri": track.get('uri'),
+            "image_url": first_image_url(album_images),
+            "duration_ms": track.get('duration_ms', 0),
+        })
 
-    search_types = normalize_spotify_search_types(request.args.get('types'))
+    for playlist in results.get('playlists', {}).get('items', []):
+        if not playlist or not playlist.get('uri'):
+            continue
 
-    try:
-        results = sp.search(
-            q=query,
-            type=search_types,
-            limit=limit,
-            market="from_token"
-        )
+        owner = playlist.get('owner') or {}
+        tracks = playlist.get('tracks') or {}
+        items.append({
+            "type": "playlist",
+            "label": "Playlist",
+            "id": playlist.get('id'),
+            "name": playlist.get('name'),
+            "subtitle": owner.get('display_name') or "Spotify",
+            "uri": playlist.get('uri'),
+            "image_url": first_image_url(playlist.get('images')),
+            "tracks_total": tracks.get('total'),
+        })
 
-        items = []
+    for episode in results.get('episodes', {}).get('items', []):
+        if not episode or not episode.get('uri'):
+            continue
 
-        for track in results.get('tracks', {}).get('items', []):
-            if not track or not track.get('uri'):
-                continue
+        show = episode.get('show') or {}
+        items.append({
+            "type": "episode",
+            "label": "Podcast",
+            "id": episode.get('id'),
+            "name": episode.get('name'),
+            "subtitle": show.get('name') or episode.get('publisher') or "Podcast episode",
+            "uri": episode.get('uri'),
+            "image_url": first_image_url(episode.get('images') or show.get('images')),
+            "duration_ms": episode.get('duration_ms', 0),
+        })
 
-            artists = ', '.join([artist['name'] for artist in track.get('artists', [])])
-            album_images = track.get('album', {}).get('images', [])
-            items.append({
-                "type": "track",
-                "label": "Song",
-                "id": track.get('id'),
-                "name": track.get('name'),
-                "subtitle": artists,
-                "uri": track.get('uri'),
-                "image_url": first_image_url(album_images),
-                "duration_ms": track.get('duration_ms', 0),
-            })
+    return items
+
+# Search results are cached per normalized query, types and limit for a short
+# while, and concurrent identical searches share one call. Spotify gets the
+# query as typed; only the cache key is normalized. A refined query ("beatl"
+# after "beat") is answered without a call by filtering the cached broader
+# result to the new words, but only when that result was complete: Spotify
+# returned every match of every type, so nothing the refined query would
+# find can be missing from it.
+SPOTIFY_SEARCH_CACHE_SIZE = 256
+SPOTIFY_SEARCH_CACHE_TTL = 120
+SPOTIFY_SEARCH_MIN_PREFIX = 2
+
+def normalize_spotify_query(query):
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+def spotify_search_complete(results):
+    """True when no result section was cut off at the requested limit."""
+    return all(
+        (section or {}).get("total", 0) <= len((section or {}).get("items") or [])
+        for section in results.values()
+    )
 
-        for playlist in results.get('playlists', {}).get('items', []):
-            if not playlist or not playlist.get('uri'):
-                continue
+def spotify_item_matches(item, tokens):
+    words = search_tokens(f"{item.get('name') or ''} {item.get('subtitle') or ''}")
+    return all(any(word.startswith(token) for word in words) for token in tokens)
+
+class SpotifySearchCache:
+    def __init__(self):
+        self._results = ExpiringLRUCache(SPOTIFY_SEARCH_CACHE_SIZE, SPOTIFY_SEARCH_CACHE_TTL, "spotify_search")
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._executor = register_thread_pool(
+            "spotify_search", ThreadPoolExecutor(max_workers=4, thread_name_prefix="spotify-search")
+        )
 
-            owner = playlist.get('owner') or {}
-            tracks = playlist.get('tracks') or {}
-            items.append({
-                "type": "playlist",
-                "label": "Playlist",
-                "id": playlist.get('id'),
-                "name": playlist.get('name'),
-                "subtitle": owner.get('display_name') or "Spotify",
-                "uri": playlist.get('uri'),
-                "image_url": first_image_url(playlist.get('images')),
-                "tracks_total": tracks.get('total'),
-            })
+    def search(self, sp, query, search_types, limit):
+        """Returns (items, 'hit' | 'refined' | 'miss')."""
+        key = (normalize_spotify_query(query), search_types, limit)
+        cached = self._results.peek(key)
+        if cached is not None:
+            self._results.record(hit=True)
+            return cached["items"], "hit"
+        refined = self._refine(key)
+        if refined is not None:
+            self._results.record(hit=True)
+            return refined, "refined"
+        self._results.record(hit=False)
+        return self._fetch(sp, key, query).result()["items"], "miss"
+
+    def _fetch(self, sp, key, query):
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._in_flight[key] = self._executor.submit(self._run, sp, key, query)
+            return future
+
+    def _run(self, sp, key, query):
+        _, search_types, limit = key
+        try:
+            results = sp.search(q=query, type=search_types, limit=limit, market="from_token")
+            entry = {
+                "items": format_spotify_search_results(results),
+                "complete": spotify_search_complete(results),
+            }
+            self._results.set(key, entry)
+            return entry
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _refine(self, key):
+        """Items of the longest complete cached prefix query that match all words of key's query."""
+        normalized, search_types, limit = key
+        tokens = search_tokens(normalized)
+        for end in range(len(normalized) - 1, SPOTIFY_SEARCH_MIN_PREFIX - 1, -1):
+            cached = self._results.peek((normalized[:end].rstrip(), search_types, limit))
+            if cached is not None and cached["complete"]:
+                return [item for item in cached["items"] if spotify_item_matches(item, tokens)]
+        return None
 
-        for episode in results.get('episodes', {}).get('items', []):
-            if not episode or not episode.get('uri'):
-                continue
+SPOTIFY_SEARCH = SpotifySearchCache()
 
-            show = episode.get('show') or {}
-            items.append({
-                "type": "episode",
-                "label": "Podcast",
-                "id": episode.get('id'),
-                "name": episode.get('name'),
-                "subtitle": show.get('name') or episode.get('publisher') or "Podcast episode",
-                "uri": episode.get('uri'),
-                "image_url": first_image_url(episode.get('images') or show.get('images')),
-                "duration_ms": episode.get('duration_ms', 0),
-            })
+@app.route('/api/spotify/search')
+def spotify_search():
+    """Search Spotify for songs, playlists, and podcast episodes."""
+    sp = get_spotify_client()
+    if not sp:
+        return jsonify({"error": "Not authenticated"}), 401
+
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify([])
+
+    try:
+        limit = max(1, min(int(request.args.get('limit', 8)), 20))
+    except (TypeError, ValueError):
+        limit = 8
+
+    search_types = normalize_spotify_search_types(request.args.get('types'))
 
-        return jsonify(items)
+    try:
+        items, source = SPOTIFY_SEARCH.search(sp, query, search_types, limit)
+        response = jsonify(items)
+        response.headers['X-Search-Cache'] = source
+        return response
     except Exception as e:
-        log_debug(f"Error searching Spotify: {e}")
+        log_event("spotify", "warning", "Error searching Spotify: {error}", error=e)
         return jsonify({"error": str(e)}), 500
 
+SPOTIFY_TRACKS_MAX_PAGE_LIMIT = 500
+
+def wants_ndjson():
+    if request.args.get('format', '').lower() == 'ndjson':
+        return True
+    return 'application/x-ndjson' in (request.headers.get('Accept') or '')
+
 @app.route('/api/spotify/playlist/<playlist_id>/tracks')
 def spotify_playlist_tracks(playlist_id):
-    """Get tracks from a specific playlist"""
+    """
+    Get tracks from a specific playlist ("liked" for Liked Songs).
+    Without parameters: the whole list as one JSON array.
+    offset/limit: one page as {items, offset, limit, total, next_offset}.
+    format=ndjson (or Accept: application/x-ndjson): one track per line,
+    streamed as pages arrive from Spotify.
+    """
     sp = get_spotify_client()
     if not sp:
         return jsonify({"error": "Not authenticated"}), 401
 
-    try:
-        tracks = []
+    if wants_ndjson():
+        def generate():
+            try:
+                for track in iter_spotify_playlist_tracks(sp, playlist_id):
+                    yield json.dumps(track) + "\n"
+            except Exception as e:
+                log_event("spotify", "warning", "Error streaming playlist tracks: {error}", error=e)
+                yield json.dumps({"error": str(e)}) + "\n"
 
-        # Special case for liked songs
-        if playlist_id == "liked":
-            results = sp.current_user_saved_tracks(limit=50)
-        else:
-            results = sp.playlist_tracks(playlist_id, limit=50)
+        return app.response_class(generate(), mimetype='application/x-ndjson')
 
-        while results:
-            for item in results['items']:
-                track = item['track'] if 'track' in item else item
-                if not track:
-                    continue
+    try:
+        if 'offset' not in request.args and 'limit' not in request.args:
+            return jsonify(load_spotify_playlist_tracks(sp, playlist_id))
 
-                artists = ', '.join([artist['name'] for artist in track.get('artists', [])])
-                album_images = track.get('album', {}).get('images', [])
-                image_url = album_images[0]['url'] if album_images else None
-
-                tracks.append({
-                    "id": track['id'],
-                    "name": track['name'],
-                    "uri": track['uri'],
-                    "artists": artists,
-                    "album": track.get('album', {}).get('name', ''),
-                    "duration_ms": track.get('duration_ms', 0),
-                    "image_url": image_url
-                })
+        try:
+            offset = max(0, int(request.args.get('offset', 0)))
+            limit = max(1, min(int(request.args.get('limit', 100)), SPOTIFY_TRACKS_MAX_PAGE_LIMIT))
+        except (TypeError, ValueError):
+            return jsonify({"error": "offset and limit must be integers"}), 400
 
-            # Get next page if available
-            if results['next']:
-                results = sp.next(results)
-            else:
-                results = None
+        # The first page opens the playlist and checks it against Spotify;
+        # later pages of the same open rely on that check.
+        tracks, snapshot_id = cached_spotify_tracks(sp, playlist_id, revalidate=offset == 0)
+        if tracks is not None:
+            items, total = tracks[offset:offset + limit], len(tracks)
+        else:
+            # Answer the first screen right away; the rest is cached meanwhile.
+            items, total = fetch_spotify_tracks_window(sp, playlist_id, offset, limit)
+            prefetch_spotify_tracks(sp, playlist_id, snapshot_id)
 
-        return jsonify(tracks)
+        next_offset = offset + len(items)
+        return jsonify({
+            "items": items,
+            "offset": offset,
+            "limit": limit,
+            "total": total,
+            "next_offset": next_offset if items and next_offset < total else None
+        })
     except Exception as e:
-        log_debug(f"Error fetching playlist tracks: {e}")
+        log_event("spotify", "warning", "Error fetching playlist tracks: {error}", error=e)
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/spotify/devices')
@@ -1518,9 +3500,85 @@ def spotify_devices():
         devices = sp.devices()
         return jsonify(devices.get('devices', []))
     except Exception as e:
-        log_debug(f"Error fetching devices: {e}")
+        log_event("spotify", "warning", "Error fetching devices: {error}", error=e)
         return jsonify({"error": str(e)}), 500
 
+# Handing playback to the AVR: after SISPOTIFY the AVR needs a moment to
+# switch input and (re)register with Spotify Connect. Instead of a fixed
+# sleep, input state and device list are polled with a short exponential
+# backoff until both are ready or the deadline passes. The AVR's Connect
+# device id is learned once and kept in the state store.
+SPOTIFY_HANDOFF_TIMEOUT = 12
+SPOTIFY_HANDOFF_INITIAL_DELAY = 0.1
+SPOTIFY_HANDOFF_MAX_DELAY = 1.0
+SPOTIFY_DENON_DEVICE_NAME_HINTS = ("denon", "avr", "x4000")
+
+def find_denon_spotify_device(devices, device_id=None):
+    """Match only device_id when one was requested. Otherwise match the
+    learned device id first, then fall back to the name hints."""
+    if device_id:
+        return next((device for device in devices if device.get('id') == device_id), None)
+
+    known_id = (STATE.get("spotify_denon_device") or {}).get("id")
+    if known_id:
+        for device in devices:
+            if device.get('id') == known_id:
+                return device
+
+    for device in devices:
+        device_name = (device.get('name') or '').lower()
+        if any(hint in device_name for hint in SPOTIFY_DENON_DEVICE_NAME_HINTS):
+            return device
+    return None
+
+def remember_denon_spotify_device(device):
+    known = STATE.get("spotify_denon_device") or {}
+    if known.get("id") != device.get("id"):
+        log_event("spotify", "info", "Learned Denon Spotify Connect device: {device_name} ({device_id})", device_name=device.get("name"), device_id=device.get("id"))
+        STATE.set("spotify_denon_device", {"id": device.get("id"), "name": device.get("name")})
+
+def is_avr_on_spotify_input():
+    status = get_avr_status()
+    if not status:
+        # Status unavailable: let the Spotify device list decide on its own.
+        return True
+    return (status.get("source") or "").upper() == "SPOTIFY"
+
+def wait_for_denon_spotify_device(sp, device_id=None, timeout=SPOTIFY_HANDOFF_TIMEOUT):
+    """Poll until the AVR is on its Spotify input and visible as a Connect
+    device; returns the device, or None when the deadline passes."""
+    deadline = time.monotonic() + timeout
+    delay = SPOTIFY_HANDOFF_INITIAL_DELAY
+    devices = []
+
+    while True:
+        if is_avr_on_spotify_input():
+            devices = sp.devices().get('devices', [])
+            device = find_denon_spotify_device(devices, device_id)
+            if device:
+                return device
+
+        if time.monotonic() + delay > deadline:
+            log_event("spotify", "debug", "Denon device not ready within {timeout}s. Available devices: {devices}", timeout=timeout, devices=devices)
+            return None
+
+        time.sleep(delay)
+        delay = min(delay * 2, SPOTIFY_HANDOFF_MAX_DELAY)
+
+def start_spotify_playback(sp, device_id, context_uri=None, track_uris=None):
+    if context_uri:
+        # Play playlist/album
+        log_event("spotify", "debug", "Starting playback of {context_uri} on device {device_id}", context_uri=context_uri, device_id=device_id)
+        sp.start_playback(device_id=device_id, context_uri=context_uri)
+    elif track_uris:
+        # Play specific tracks
+        log_event("spotify", "debug", "Starting playback of tracks on device {device_id}", device_id=device_id)
+        sp.start_playback(device_id=device_id, uris=track_uris)
+    else:
+        # Just transfer playback
+        log_event("spotify", "debug", "Transferring playback to device {device_id}", device_id=device_id)
+        sp.transfer_playback(device_id=device_id, force_play=True)
+
 @app.route('/api/spotify/play', methods=['POST'])
 def spotify_play():
     """Play Spotify content on AVR"""
@@ -1531,54 +3589,49 @@ def spotify_play():
     data = request.json
     context_uri = data.get('context_uri')  # playlist/album URI
     track_uris = data.get('track_uris') or data.get('uris')  # specific tracks or episodes
-    device_id = data.get('device_id')      # target device
+    requested_device_id = data.get('device_id')      # target device
 
     try:
-        # Step 1: Switch AVR to Spotify input
-        log_debug("Switching AVR to Spotify input...")
-        if not send_avr_command("SISPOTIFY"):
-            log_debug("Failed to switch to Spotify input, but continuing...")
-
-        # Wait a moment for AVR to switch
-        import time
-        time.sleep(1)
-
-        # Step 2: Find Denon device if device_id not provided
-        if not device_id:
-            devices = sp.devices()
-            denon_device = None
-
-            for device in devices.get('devices', []):
-                # Look for Denon, AVR, or X4000 in device name
-                device_name = device.get('name', '').lower()
-                if 'denon' in device_name or 'avr' in device_name or 'x4000' in device_name:
-                    denon_device = device
-                    device_id = device['id']
-                    log_debug(f"Found Denon device: {device['name']}")
-                    break
-
-            if not device_id:
-                log_debug(f"Available devices: {devices.get('devices', [])}")
+        # Step 1: Switch AVR to Spotify input (skipped when already there)
+        status = get_avr_status()
+        if not status or (status.get("source") or "").upper() != "SPOTIFY":
+            log_event("spotify", "debug", "Switching AVR to Spotify input...")
+            if not send_avr_command("SISPOTIFY"):
+                log_event("spotify", "warning", "Failed to switch to Spotify input, but continuing...")
+
+        # Step 2: Wait until the AVR is on the input and registered with
+        # Spotify Connect. Spotify can still briefly answer 404 for a device
+        # that just appeared, so that is retried until the same deadline.
+        deadline = time.monotonic() + SPOTIFY_HANDOFF_TIMEOUT
+        delay = SPOTIFY_HANDOFF_INITIAL_DELAY
+        while True:
+            device = wait_for_denon_spotify_device(
+                sp, requested_device_id, max(0, deadline - time.monotonic())
+            )
+            if not device:
+                if requested_device_id:
+                    return jsonify({"error": f"Spotify Connect device {requested_device_id} not found"}), 404
                 return jsonify({"error": "Denon AVR not found in Spotify Connect devices. Make sure Spotify input is active on AVR."}), 404
 
-        # Step 3: Transfer playback and play
-        if context_uri:
-            # Play playlist/album
-            log_debug(f"Starting playback of {context_uri} on device {device_id}")
-            sp.start_playback(device_id=device_id, context_uri=context_uri)
-        elif track_uris:
-            # Play specific tracks
-            log_debug(f"Starting playback of tracks on device {device_id}")
-            sp.start_playback(device_id=device_id, uris=track_uris)
-        else:
-            # Just transfer playback
-            log_debug(f"Transferring playback to device {device_id}")
-            sp.transfer_playback(device_id=device_id, force_play=True)
-
+            device_id = device['id']
+            try:
+                # Step 3: Transfer playback and play
+                start_spotify_playback(sp, device_id, context_uri, track_uris)
+                break
+            except SpotifyException as e:
+                if e.http_status != 404 or time.monotonic() + delay > deadline:
+                    raise
+                log_event("spotify", "warning", "Device {device_id} not accepting playback yet: {error}", device_id=device_id, error=e)
+                time.sleep(delay)
+                delay = min(delay * 2, SPOTIFY_HANDOFF_MAX_DELAY)
+
+        if not requested_device_id:
+            remember_denon_spotify_device(device)
+        SPOTIFY_NOW_PLAYING.refresh_soon()
         return jsonify({"status": "success", "device_id": device_id})
 
     except Exception as e:
-        log_debug(f"Error playing Spotify: {e}")
+        log_event("spotify", "warning", "Error playing Spotify: {error}", error=e)
         if DEBUG:
             import traceback
             traceback.print_exc()
@@ -1608,46 +3661,1141 @@ def spotify_control():
         else:
             return jsonify({"error": "Invalid action"}), 400
 
+        SPOTIFY_NOW_PLAYING.refresh_soon()
         return jsonify({"status": "success"})
     except Exception as e:
-        log_debug(f"Error controlling Spotify: {e}")
+        log_event("spotify", "warning", "Error controlling Spotify: {error}", error=e)
         return jsonify({"error": str(e)}), 500
 
+# Now playing: one background poller asks Spotify for the playback state and
+# every dashboard reads its snapshot, so API usage does not grow with the
+# number of open tabs. Between fetches progress_ms is extrapolated from the
+# monotonic clock. The poller runs while someone reads and stops after
+# SPOTIFY_NOW_PLAYING_IDLE_TIMEOUT seconds without readers. When a fetch
+# fails, readers keep the last good state marked "stale" while the poller
+# retries with a short backoff.
+SPOTIFY_NOW_PLAYING_INTERVAL = 10        # while playing
+SPOTIFY_NOW_PLAYING_PAUSED_INTERVAL = 30  # while paused or nothing is playing
+SPOTIFY_NOW_PLAYING_MIN_INTERVAL = 1
+SPOTIFY_NOW_PLAYING_TRACK_END_SLACK = 0.5  # poll just after the track should end
+SPOTIFY_NOW_PLAYING_COMMAND_DELAY = 0.5    # Spotify needs a moment to reflect commands
+SPOTIFY_NOW_PLAYING_IDLE_TIMEOUT = 120
+SPOTIFY_NOW_PLAYING_FIRST_FETCH_WAIT = 5
+SPOTIFY_NOW_PLAYING_ERROR_RETRY = 2       # doubled per failure, up to the paused interval
+
+def format_spotify_playback(current):
+    """Shape sp.current_playback() for /api/spotify/current"""
+    if not current or not current.get('item'):
+        return {"playing": False}
+
+    track = current['item']
+    artists = ', '.join([artist['name'] for artist in track.get('artists', [])])
+    album_images = track.get('album', {}).get('images', [])
+    image_url = album_images[0]['url'] if album_images else None
+
+    return {
+        "playing": current.get('is_playing', False),
+        "track": {
+            "name": track['name'],
+            "artists": artists,
+            "album": track.get('album', {}).get('name', ''),
+            "image_url": image_url,
+            "duration_ms": track.get('duration_ms', 0),
+            "progress_ms": current.get('progress_ms') or 0
+        },
+        "device": {
+            "name": (current.get('device') or {}).get('name', ''),
+            "type": (current.get('device') or {}).get('type', '')
+        }
+    }
+
+class SpotifyNowPlayingPoller:
+    """Shared, adaptively polled Spotify playback state."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._fetched = threading.Event()
+        self._thread = None
+        self._snapshot = None  # (payload, fetched_at monotonic)
+        self._error = None
+        self._last_read = 0.0
+
+    def read(self):
+        """Current playback state with extrapolated progress. Raises the
+        last fetch error when no state could be fetched yet."""
+        self._ensure_running()
+        self._fetched.wait(SPOTIFY_NOW_PLAYING_FIRST_FETCH_WAIT)
+
+        with self._lock:
+            snapshot, error = self._snapshot, self._error
+        if snapshot is None:
+            raise error or TimeoutError("Spotify playback state not available yet")
+        payload = self._extrapolate(*snapshot)
+        if error is not None:
+            payload = {**payload, "stale": True}
+        return payload
+
+    def refresh_soon(self, delay=SPOTIFY_NOW_PLAYING_COMMAND_DELAY):
+        """Re-fetch shortly, e.g. after a play/pause/skip command."""
+        with self._lock:
+            if self._thread is None:
+                return
+        timer = threading.Timer(delay, self._wake.set)
+        timer.daemon = True
+        timer.start()
+
+    def _ensure_running(self):
+        # Same lock as the idle check in _run: the poller either sees this
+        # read and keeps going, or has already stopped and a new one starts.
+        with self._lock:
+            self._last_read = time.monotonic()
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True, name="spotify-now-playing")
+            self._thread.start()
+
+    @staticmethod
+    def _extrapolate(payload, fetched_at):
+        if not payload.get("playing") or "track" not in payload:
+            return payload
+
+        track = payload["track"]
+        elapsed_ms = int((time.monotonic() - fetched_at) * 1000)
+        progress = track["progress_ms"] + elapsed_ms
+        if track["duration_ms"]:
+            progress = min(progress, track["duration_ms"])
+        return {**payload, "track": {**track, "progress_ms": progress}}
+
+    def _next_interval(self, payload):
+        if not payload.get("playing") or "track" not in payload:
+            return SPOTIFY_NOW_PLAYING_PAUSED_INTERVAL
+
+        track = payload["track"]
+        remaining = (track["duration_ms"] - track["progress_ms"]) / 1000
+        interval = min(SPOTIFY_NOW_PLAYING_INTERVAL, remaining + SPOTIFY_NOW_PLAYING_TRACK_END_SLACK)
+        return max(SPOTIFY_NOW_PLAYING_MIN_INTERVAL, interval)
+
+    def _poll(self):
+        sp = get_spotify_client()
+        if not sp:
+            raise SpotifyOauthError("Not authenticated with Spotify")
+
+        with SPOTIFY_GATEWAY.priority(SPOTIFY_PRIORITY_BACKGROUND):
+            current = sp.current_playback()
+        fetched_at = time.monotonic()
+        payload = format_spotify_playback(current)
+        with self._lock:
+            self._snapshot = (payload, fetched_at)
+            self._error = None
+        return self._next_interval(payload)
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self._lock:
+                if time.monotonic() - self._last_read > SPOTIFY_NOW_PLAYING_IDLE_TIMEOUT:
+                    # Nobody is watching: stop, and let the next reader wait
+                    # for a fresh fetch instead of a stale snapshot.
+                    self._thread = None
+                    self._snapshot = None
+                    self._error = None
+                    self._fetched.clear()
+                    log_event("spotify", "debug", "Spotify now-playing poller idle, stopping")
+                    return
+
+            self._wake.clear()
+            try:
+                interval = self._poll()
+                failures = 0
+            except Exception as e:
+                log_event("spotify", "warning", "Error fetching current track: {error}", error=e)
+                with self._lock:
+                    self._error = e
+                interval = min(SPOTIFY_NOW_PLAYING_ERROR_RETRY * 2 ** failures, SPOTIFY_NOW_PLAYING_PAUSED_INTERVAL)
+                failures += 1
+            self._fetched.set()
+            self._wake.wait(interval)
+
+SPOTIFY_NOW_PLAYING = SpotifyNowPlayingPoller()
+
+@app.route('/api/spotify/gateway')
+def spotify_gateway_stats():
+    """Spotify request budget and per-endpoint counters"""
+    return jsonify(SPOTIFY_GATEWAY.stats())
+
 @app.route('/api/spotify/current')
 def spotify_current():
     """Get currently playing track"""
-    sp = get_spotify_client()
-    if not sp:
+    if not get_spotify_client():
         return jsonify({"error": "Not authenticated"}), 401
 
     try:
-        current = sp.current_playback()
-        if not current or not current.get('item'):
-            return jsonify({"playing": False})
+        return jsonify(SPOTIFY_NOW_PLAYING.read())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        track = current['item']
-        artists = ', '.join([artist['name'] for artist in track.get('artists', [])])
-        album_images = track.get('album', {}).get('images', [])
-        image_url = album_images[0]['url'] if album_images else None
 
-        return jsonify({
-            "playing": current.get('is_playing', False),
-            "track": {
-                "name": track['name'],
-                "artists": artists,
-                "album": track.get('album', {}).get('name', ''),
-                "image_url": image_url,
-                "duration_ms": track.get('duration_ms', 0),
-                "progress_ms": current.get('progress_ms', 0)
-            },
-            "device": {
-                "name": current.get('device', {}).get('name', ''),
-                "type": current.get('device', {}).get('type', '')
+# ============ STATIC ASSETS ============
+# The web UI and the Home Assistant tile are served without a build step. On
+# first use (warm-up does it at boot) each asset is read once, hashed and
+# compressed with gzip and, when the brotli module is installed, brotli.
+# index.html links /static/<name>.<hash>.<ext>: those URLs never change
+# content, so browsers cache them as immutable for a year. The plain
+# /static/<name> URL (the Home Assistant resource) is revalidated on every
+# load and answered with a 304 while the file is unchanged.
+
+STATIC_ASSETS_DIR = os.path.join(app.root_path, "static")
+STATIC_ASSET_NAMES = ("app.js", "denon-vtuner-tile.js", "style.css")
+STATIC_ASSET_MAX_AGE = 365 * 24 * 3600
+STATIC_ASSET_VERSIONED_RE = re.compile(r"^(.+)\.([0-9a-f]{12})(\.[a-z]+)$")
+STATIC_ASSET_CONTENT_TYPES = {
+    ".js": "text/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+}
+# Preferred first; brotli is skipped when the module is not installed.
+STATIC_ASSET_ENCODINGS = ("br", "gzip")
+
+def compress_static_asset(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=11) if brotli else None
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+class StaticAssets:
+    """Hashed, precompressed copies of the files in STATIC_ASSET_NAMES."""
+
+    def __init__(self, directory, names):
+        self.directory = directory
+        self.names = names
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def _load(self, name):
+        path = os.path.join(self.directory, name)
+        mtime = os.stat(path).st_mtime_ns
+        with open(path, "rb") as f:
+            data = f.read()
+
+        bodies = {"identity": data}
+        for encoding in STATIC_ASSET_ENCODINGS:
+            body = compress_static_asset(data, encoding)
+            if body is not None and len(body) < len(data):
+                bodies[encoding] = body
+
+        stem, ext = os.path.splitext(name)
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        return {
+            "digest": digest,
+            "mtime": mtime,
+            "content_type": STATIC_ASSET_CONTENT_TYPES.get(ext, "application/octet-stream"),
+            "versioned_name": f"{stem}.{digest}{ext}",
+            "bodies": bodies,
+        }
+
+    def get(self, name):
+        """Return the asset for a name in STATIC_ASSET_NAMES, or None."""
+        if name not in self.names:
+            return None
+
+        asset = self._assets.get(name)
+        # In debug mode edits to the files show up without a restart.
+        if asset is not None and DEBUG and os.stat(os.path.join(self.directory, name)).st_mtime_ns != asset["mtime"]:
+            asset = None
+        if asset is None:
+            with self._lock:
+                current = self._assets.get(name)
+                if current is not None and current["mtime"] == os.stat(os.path.join(self.directory, name)).st_mtime_ns:
+                    return current
+                asset = self._load(name)
+                self._assets[name] = asset
+        return asset
+
+    def load_all(self):
+        for name in self.names:
+            self.get(name)
+
+    def resolve(self, filename):
+        """Map a requested filename to (asset, versioned), or (None, False)."""
+        asset = self.get(filename)
+        if asset is not None:
+            return asset, False
+
+        match = STATIC_ASSET_VERSIONED_RE.match(filename)
+        if match:
+            stem, digest, ext = match.groups()
+            asset = self.get(stem + ext)
+            if asset is not None:
+                # An outdated hash (a page cached across an upgrade) gets the
+                # current file, but not as immutable.
+                return asset, asset["digest"] == digest
+        return None, False
+
+STATIC_ASSETS = StaticAssets(STATIC_ASSETS_DIR, STATIC_ASSET_NAMES)
+
+def negotiate_static_encoding(bodies):
+    accepted = request.accept_encodings
+    for encoding in STATIC_ASSET_ENCODINGS:
+        if encoding in bodies and accepted.quality(encoding) > 0:
+            return encoding
+    return "identity"
+
+@app.template_global()
+def asset_url(name):
+    """Content-hashed URL of a static asset, for templates."""
+    asset = STATIC_ASSETS.get(name)
+    filename = asset["versioned_name"] if asset else name
+    return url_for("static", filename=filename)
+
+@app.endpoint("static")
+def static_asset(filename):
+    asset, versioned = STATIC_ASSETS.resolve(filename)
+    if asset is None:
+        return app.send_static_file(filename)
+
+    encoding = negotiate_static_encoding(asset["bodies"])
+    response = app.response_class(asset["bodies"][encoding], content_type=asset["content_type"])
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.set_etag(f"{asset['digest']}-{encoding}")
+    if versioned:
+        response.headers["Cache-Control"] = f"public, max-age={STATIC_ASSET_MAX_AGE}, immutable"
+    else:
+        response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+# ============ ARTWORK CACHE ============
+# Station favicons and Spotify cover art live on third-party hosts, some slow
+# or dead. /art fetches each image once, normalizes it (first frame, EXIF
+# orientation, RGB/RGBA) and shrinks it to one of a few fixed sizes, then
+# keeps the result in a size-bounded LRU store on disk. Responses carry a
+# content-hash ETag, so browsers revalidate with a cheap 304. The vTuner XML
+# points the AVR's <Logo> at it as well: plain HTTP on the LAN, no TLS.
+
+ART_SIZES = (64, 150, 300)
+ART_DEFAULT_SIZE = 150
+ART_MAX_SOURCE_BYTES = 5 * 1024 * 1024
+ART_FETCH_TIMEOUT = 5
+# Images (source URLs) that failed are not fetched again for this long.
+ART_FAILURE_TTL = 600
+ART_BROWSER_MAX_AGE = 7 * 24 * 3600
+ART_FILE_RE = re.compile(r"^([0-9a-f]{32})\.([0-9a-f]{16})\.([a-z]+)$")
+ART_MIMETYPES = {
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "ico": "image/x-icon",
+}
+
+class ArtDiskCache:
+    """Size-bounded LRU store of images on disk, named <key>.<etag>.<ext>."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = None
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # Rebuild the LRU order from file mtimes, which get() keeps fresh.
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+        files = []
+        for name in os.listdir(self.directory):
+            match = ART_FILE_RE.match(name)
+            if not match:
+                continue
+            if match.group(3) not in ART_MIMETYPES:
+                # No longer served (such as SVG, which can carry scripts).
+                os.remove(os.path.join(self.directory, name))
+                continue
+            file_stat = os.stat(os.path.join(self.directory, name))
+            files.append((file_stat.st_mtime, name, file_stat.st_size, match))
+
+        for _, name, size, match in sorted(files):
+            key, etag, ext = match.groups()
+            self._entries[key] = (name, etag, ext, size)
+            self._total_bytes += size
+
+    def _ensure_loaded(self):
+        if self._entries is None:
+            self._load()
+
+    def _describe(self, name, etag, ext):
+        return os.path.join(self.directory, name), etag, ART_MIMETYPES.get(ext, "application/octet-stream")
+
+    def get(self, key):
+        """Return (path, etag, mimetype) or None."""
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            name, etag, ext, _ = entry
+            self._entries.move_to_end(key)
+            try:
+                os.utime(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                self._drop(key)
+                return None
+            return self._describe(name, etag, ext)
+
+    def put(self, key, data, ext):
+        etag = hashlib.sha256(data).hexdigest()[:16]
+        name = f"{key}.{etag}.{ext}"
+        path = os.path.join(self.directory, name)
+
+        with self._lock:
+            self._ensure_loaded()
+            if key in self._entries:
+                self._drop(key)
+
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+
+            self._entries[key] = (name, etag, ext, len(data))
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+
+            return self._describe(name, etag, ext)
+
+    def _drop(self, key):
+        name, _, _, size = self._entries.pop(key)
+        self._total_bytes -= size
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+_ART_CACHE = ArtDiskCache(ART_CACHE_DIR, ART_CACHE_MAX_BYTES)
+_ART_FAILURES = ExpiringLRUCache(1000, ART_FAILURE_TTL, "art_failures")
+_ART_FETCH_LOCKS = {}
+_ART_FETCH_LOCKS_LOCK = threading.Lock()
+
+def art_size(raw_value):
+    """Snap a requested size to the nearest supported one."""
+    try:
+        requested = int(raw_value)
+    except (TypeError, ValueError):
+        return ART_DEFAULT_SIZE
+    return min(ART_SIZES, key=lambda size: abs(size - requested))
+
+def art_cache_key(source_url, size):
+    return hashlib.sha256(f"{size}:{source_url}".encode("utf-8")).hexdigest()[:32]
+
+def normalize_art_image(data, size):
+    """Return (bytes, ext) resized to fit size x size; PNG keeps transparency."""
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or (
+            image.mode == "P" and "transparency" in image.info
+        )
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        image.thumbnail((size, size), Image.LANCZOS)
+
+        output = io.BytesIO()
+        if has_alpha:
+            image.save(output, "PNG", optimize=True)
+            return output.getvalue(), "png"
+        image.save(output, "JPEG", quality=85, optimize=True)
+        return output.getvalue(), "jpg"
+
+def fetch_art_source(source_url):
+    """Download an image; returns (bytes, content type) or raises."""
+    with requests.get(
+        source_url,
+        headers={"User-Agent": "denonAVR-vTuner/1.0", "Accept": "image/*"},
+        stream=True,
+        timeout=ART_FETCH_TIMEOUT
+    ) as resp:
+        resp.raise_for_status()
+        content_type = (resp.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+
+        data = bytearray()
+        for chunk in resp.iter_content(chunk_size=65536):
+            data.extend(chunk)
+            if len(data) > ART_MAX_SOURCE_BYTES:
+                raise ValueError(f"image larger than {ART_MAX_SOURCE_BYTES} bytes")
+        return bytes(data), content_type
+
+def build_art(source_url, size):
+    data, content_type = fetch_art_source(source_url)
+
+    if Image is not None:
+        try:
+            return normalize_art_image(data, size)
+        except Exception as e:
+            # Served untouched below if it is a known raster type. SVG never
+            # is: served from this origin, its scripts would run here.
+            log_event("art", "warning", "Could not normalize artwork {source_url}: {error}", source_url=source_url, error=e)
+
+    ext = next((ext for ext, mimetype in ART_MIMETYPES.items() if mimetype == content_type), None)
+    if ext is None:
+        raise ValueError(f"not an image: {content_type or 'unknown content type'}")
+    return data, ext
+
+def get_art(source_url, size):
+    """Return (path, etag, mimetype) of the cached artwork, or None."""
+    key = art_cache_key(source_url, size)
+    cached = _ART_CACHE.get(key)
+    CACHE_REQUESTS.inc("art", "hit" if cached else "miss")
+    if cached:
+        return cached
+    if _ART_FAILURES.get(source_url):
+        return None
+
+    # One download per image, however many list rows ask for it at once.
+    with _ART_FETCH_LOCKS_LOCK:
+        fetch_lock = _ART_FETCH_LOCKS.setdefault(key, threading.Lock())
+
+    try:
+        with fetch_lock:
+            cached = _ART_CACHE.get(key)
+            if cached:
+                return cached
+            if _ART_FAILURES.get(source_url):
+                return None
+
+            try:
+                data, ext = build_art(source_url, size)
+            except Exception as e:
+                log_event("art", "warning", "Artwork fetch failed for {source_url}: {error}", source_url=source_url, error=e)
+                _ART_FAILURES.set(source_url, True)
+                return None
+
+            return _ART_CACHE.put(key, data, ext)
+    finally:
+        with _ART_FETCH_LOCKS_LOCK:
+            _ART_FETCH_LOCKS.pop(key, None)
+
+@app.route('/art')
+def art_proxy():
+    source_url = request.args.get('url', '')
+    if not source_url.lower().startswith(("http://", "https://")):
+        return "Missing or invalid url", 400
+
+    art = get_art(source_url, art_size(request.args.get('size')))
+    if art is None:
+        return "Image not available", 404
+
+    path, etag, mimetype = art
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        etag=etag,
+        conditional=True,
+        max_age=ART_BROWSER_MAX_AGE
+    )
+    # Third-party bytes on this origin: never sniffed into HTML or scripts.
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    response.headers["Content-Security-Policy"] = "default-src 'none'; sandbox"
+    return response
+
+
+# ============ RADIO-BROWSER CLIENT ============
+# radio-browser.info is a set of community mirrors of varying speed. One
+# client is shared by the catalog, the web search and the vTuner menu: it
+# discovers the mirrors via DNS, keeps an EWMA of latency and errors per
+# mirror, asks the best one first and, when it has not answered within its
+# usual (percentile) latency, sends a hedged duplicate to the next best and
+# takes whichever answers first.
+
+RADIO_BROWSER_DISCOVERY_HOST = "all.api.radio-browser.info"
+RADIO_BROWSER_DISCOVERY_INTERVAL = 3600
+RADIO_BROWSER_USER_AGENT = "denonAVR-vTuner/1.0"
+RADIO_BROWSER_EWMA_ALPHA = 0.3
+# A mirror that failed every recent request scores this many times worse.
+RADIO_BROWSER_ERROR_PENALTY = 10
+# Assumed latency of mirrors without samples; low so new mirrors get tried.
+RADIO_BROWSER_DEFAULT_LATENCY = 0.3
+RADIO_BROWSER_LATENCY_SAMPLES = 50
+RADIO_BROWSER_HEDGE_PERCENTILE = 0.9
+RADIO_BROWSER_HEDGE_DEFAULT_DELAY = 0.5
+RADIO_BROWSER_HEDGE_MIN_DELAY = 0.1
+RADIO_BROWSER_HEDGE_MAX_DELAY = 2.0
+RADIO_BROWSER_MAX_ATTEMPTS = 3
+
+class RadioBrowserClient:
+    """Hedged, health-scored GETs against a set of radio-browser mirrors."""
+
+    def __init__(self, mirrors, discover=False):
+        self._mirrors = list(mirrors)
+        self._discover = discover
+        self._discovered_at = 0
+        self._discovery_running = False
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._session.headers["User-Agent"] = RADIO_BROWSER_USER_AGENT
+        self._session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=8))
+        self._executor = register_thread_pool(
+            "radio_browser", ThreadPoolExecutor(max_workers=8, thread_name_prefix="radio-browser")
+        )
+
+    def mirrors(self):
+        self._maybe_discover()
+        with self._lock:
+            return list(self._mirrors)
+
+    def _maybe_discover(self):
+        if not self._discover:
+            return
+
+        with self._lock:
+            if self._discovery_running or time.monotonic() - self._discovered_at < RADIO_BROWSER_DISCOVERY_INTERVAL:
+                return
+            self._discovery_running = True
+
+        threading.Thread(target=self._run_discovery, daemon=True, name="radio-browser-discovery").start()
+
+    def _run_discovery(self):
+        try:
+            mirrors = discover_radio_browser_mirrors()
+            if mirrors:
+                log_event("radio_browser", "info", "Discovered radio-browser mirrors: {mirrors}", mirrors=mirrors)
+                with self._lock:
+                    self._mirrors = mirrors
+        except Exception as e:
+            log_event("radio_browser", "warning", "radio-browser mirror discovery failed: {error}", error=e)
+        finally:
+            with self._lock:
+                self._discovered_at = time.monotonic()
+                self._discovery_running = False
+
+    def _mirror_stats(self, mirror):
+        stats = self._stats.get(mirror)
+        if stats is None:
+            stats = {"latency": None, "errors": 0.0, "samples": deque(maxlen=RADIO_BROWSER_LATENCY_SAMPLES),
+                     "requests": 0, "failures": 0}
+            self._stats[mirror] = stats
+        return stats
+
+    def record(self, mirror, latency=None, failed=False):
+        alpha = RADIO_BROWSER_EWMA_ALPHA
+        with self._lock:
+            stats = self._mirror_stats(mirror)
+            stats["requests"] += 1
+            stats["errors"] = alpha * (1.0 if failed else 0.0) + (1 - alpha) * stats["errors"]
+            if failed:
+                stats["failures"] += 1
+                return
+
+            stats["samples"].append(latency)
+            previous = stats["latency"]
+            stats["latency"] = latency if previous is None else alpha * latency + (1 - alpha) * previous
+
+    def _score(self, mirror):
+        stats = self._stats.get(mirror)
+        if stats is None:
+            return RADIO_BROWSER_DEFAULT_LATENCY
+        latency = stats["latency"] if stats["latency"] is not None else RADIO_BROWSER_DEFAULT_LATENCY
+        return latency * (1 + RADIO_BROWSER_ERROR_PENALTY * stats["errors"])
+
+    def ranked_mirrors(self):
+        mirrors = self.mirrors()
+        with self._lock:
+            return sorted(mirrors, key=self._score)
+
+    def hedge_delay(self, mirror):
+        with self._lock:
+            stats = self._stats.get(mirror)
+            samples = sorted(stats["samples"]) if stats else []
+
+        if not samples:
+            return RADIO_BROWSER_HEDGE_DEFAULT_DELAY
+
+        percentile = samples[int(RADIO_BROWSER_HEDGE_PERCENTILE * (len(samples) - 1))]
+        return min(RADIO_BROWSER_HEDGE_MAX_DELAY, max(RADIO_BROWSER_HEDGE_MIN_DELAY, percentile))
+
+    def _get(self, mirror, path, params, timeout):
+        started = time.monotonic()
+        try:
+            with observe_seconds(RADIO_BROWSER_SECONDS, mirror):
+                resp = self._session.get(f"{mirror}/{path}", params=params, timeout=timeout)
+                resp.raise_for_status()
+                data = resp.json()
+        except Exception:
+            self.record(mirror, failed=True)
+            raise
+
+        self.record(mirror, time.monotonic() - started)
+        return data
+
+    def fetch(self, path, params=None, timeout=6, hedge=True):
+        """
+        Return (json, mirror). A failed attempt moves on to the next mirror
+        right away; with hedge, a slow one gets a duplicate request after
+        its percentile latency. Raises the last error (or TimeoutError)
+        when no mirror answered within timeout.
+        """
+        candidates = self.ranked_mirrors()[:RADIO_BROWSER_MAX_ATTEMPTS]
+        deadline = time.monotonic() + timeout
+        launched = []
+        pending = {}
+        last_error = None
+
+        def launch():
+            mirror = candidates[len(launched)]
+            launched.append(mirror)
+            pending[self._executor.submit(self._get, mirror, path, params, timeout)] = mirror
+
+        launch()
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            can_launch = len(launched) < len(candidates)
+            wait_for = remaining
+            if hedge and can_launch:
+                wait_for = min(wait_for, self.hedge_delay(launched[-1]))
+
+            done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                mirror = pending.pop(future)
+                try:
+                    data = future.result()
+                except Exception as e:
+                    log_event("radio_browser", "warning", "radio-browser mirror {mirror} failed: {error}", mirror=mirror, error=e)
+                    last_error = e
+                    continue
+
+                if len(launched) > 1:
+                    log_event("radio_browser", "debug", "radio-browser {path} answered by {mirror} ({count} mirrors asked)", path=path, mirror=mirror, count=len(launched))
+                return data, mirror
+
+            if can_launch and (done or hedge):
+                if not done:
+                    log_event("radio_browser", "debug", "radio-browser mirror {mirror} is slow, hedging to {hedge}", mirror=launched[-1], hedge=candidates[len(launched)])
+                launch()
+
+        raise last_error or TimeoutError(f"radio-browser {path} timed out after {timeout}s")
+
+    def health(self):
+        with self._lock:
+            health = []
+            for mirror in sorted(self._mirrors, key=self._score):
+                stats = self._mirror_stats(mirror)
+                health.append({
+                    "mirror": mirror,
+                    "score": round(self._score(mirror), 4),
+                    "latency_ewma": stats["latency"],
+                    "error_ewma": round(stats["errors"], 4),
+                    "requests": stats["requests"],
+                    "failures": stats["failures"],
+                })
+            return health
+
+def discover_radio_browser_mirrors():
+    """Resolve the mirror list the way radio-browser recommends: all IPs behind
+    the discovery host, reverse-resolved to their mirror hostnames."""
+    hosts = set()
+    for info in socket.getaddrinfo(RADIO_BROWSER_DISCOVERY_HOST, 443, proto=socket.IPPROTO_TCP):
+        try:
+            hosts.add(socket.gethostbyaddr(info[4][0])[0])
+        except OSError:
+            continue
+    return sorted(f"https://{host}/json" for host in hosts)
+
+RADIO_BROWSER = RadioBrowserClient(RADIO_BROWSER_MIRRORS, discover=RADIO_BROWSER_DISCOVER_MIRRORS)
+
+def radio_browser_fetch(path, params=None, timeout=6, hedge=True):
+    """Return (json, mirror) from the fastest radio-browser mirror that answers."""
+    return RADIO_BROWSER.fetch(path, params, timeout, hedge)
+
+@traced("radio_browser")
+def radio_browser_request(path, params=None, timeout=6, hedge=True):
+    return radio_browser_fetch(path, params, timeout, hedge)[0]
+
+@app.route('/api/radio_browser/mirrors')
+def api_radio_browser_mirrors():
+    return jsonify(RADIO_BROWSER.health())
+
+
+# ============ STATION CATALOG & SEARCH ============
+# radio-browser's stations/search only does a substring match on the name and
+# costs a round trip per keystroke. The most clicked stations are kept in a
+# local catalog instead and indexed for prefix, trigram (typo tolerant) and
+# field-weighted search over name, tags, country and language. Both the web
+# UI search and the AVR's vTuner search use it. The catalog only holds the
+# top STATION_CATALOG_SIZE stations, so when it finds fewer than
+# SEARCH_CATALOG_MIN_RESULTS (or is not loaded yet) radio-browser's own search
+# fills up the list.
+
+SEARCH_TOKEN_RE = re.compile(r"[^\W_]+")
+# Matching a term in the name counts more than in the tags or location.
+SEARCH_FIELD_WEIGHTS = (("name", 1.0), ("tags", 0.6), ("country", 0.4), ("language", 0.4))
+SEARCH_EXACT_SCORE = 1.0
+SEARCH_PREFIX_SCORE = 0.8
+SEARCH_FUZZY_SCORE = 0.7
+# Dice coefficient over trigrams a token needs to count as a typo of a term.
+SEARCH_FUZZY_MIN_SIMILARITY = 0.5
+SEARCH_FUZZY_MIN_TERM_LENGTH = 3
+# Tokens below that similarity still count when they are this few edits
+# (insertions, deletions, substitutions, transpositions) away; short words
+# share too few trigrams for a single typo to pass the Dice check.
+SEARCH_FUZZY_MAX_EDITS_SHORT = 1
+SEARCH_FUZZY_MAX_EDITS_LONG = 2
+SEARCH_FUZZY_LONG_TERM_LENGTH = 8
+# Fewer catalog hits than this also ask radio-browser.
+SEARCH_CATALOG_MIN_RESULTS = 5
+# Fuzzy matching only runs for terms with fewer prefix matches than this.
+SEARCH_FUZZY_PREFIX_THRESHOLD = 3
+# Caps how many vocabulary tokens a short prefix like "r" expands to.
+SEARCH_MAX_PREFIX_EXPANSIONS = 400
+# Share of the ranking decided by clickcount (log scaled) vs. match quality.
+SEARCH_POPULARITY_WEIGHT = 0.5
+
+# Browse trees for the AVR menu: menu key -> (title, station field). Tags and
+# languages are comma-separated lists in radio-browser.
+STATION_BROWSE_CATEGORIES = {
+    "genre": ("Genres", "tags"),
+    "country": ("Countries", "country"),
+    "language": ("Languages", "language"),
+}
+STATION_BROWSE_MIN_STATIONS = 3
+STATION_BROWSE_MAX_GROUPS = 100
+STATION_BROWSE_TOP_STATIONS = 100
+
+_STATION_CATALOG = {"index": None, "browse": {}, "loaded_at": 0}
+_STATION_CATALOG_WORKER_LOCK = threading.Lock()
+_STATION_CATALOG_WORKER_STARTED = False
+
+def normalize_search_text(value):
+    """Casefold and strip accents, so 'Café' matches 'cafe'."""
+    decomposed = unicodedata.normalize("NFKD", str(value or "").casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def search_tokens(value):
+    return SEARCH_TOKEN_RE.findall(normalize_search_text(value))
+
+def search_edit_distance(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+def search_trigrams(token):
+    # Two leading pad characters weigh the start of a word, where typos are
+    # least likely.
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class StationSearchIndex:
+    """Immutable in-memory search index over radio-browser station dicts."""
+
+    def __init__(self, stations):
+        self.stations = stations
+        self.by_uuid = {
+            station["stationuuid"]: station
+            for station in stations
+            if station.get("stationuuid")
+        }
+        self.postings = {}
+
+        for position, station in enumerate(stations):
+            for field, weight in SEARCH_FIELD_WEIGHTS:
+                for token in search_tokens(station.get(field)):
+                    posting = self.postings.setdefault(token, {})
+                    if posting.get(position, 0) < weight:
+                        posting[position] = weight
+
+        self.vocabulary = sorted(self.postings)
+        self.trigrams = {}
+        self.trigram_counts = {}
+        for token in self.vocabulary:
+            grams = search_trigrams(token)
+            self.trigram_counts[token] = len(grams)
+            for gram in grams:
+                self.trigrams.setdefault(gram, []).append(token)
+
+        max_clicks = max((self.clickcount(s) for s in stations), default=0)
+        popularity_scale = math.log1p(max_clicks) or 1.0
+        self.popularity = [
+            SEARCH_POPULARITY_WEIGHT * math.log1p(self.clickcount(s)) / popularity_scale
+            for s in stations
+        ]
+
+    def __len__(self):
+        return len(self.stations)
+
+    @staticmethod
+    def clickcount(station):
+        try:
+            return max(0, int(station.get("clickcount") or 0))
+        except (TypeError, ValueError):
+            return 0
+
+    def match_term(self, term):
+        """Return {token: match quality} for a single query term."""
+        matches = {}
+
+        position = bisect.bisect_left(self.vocabulary, term)
+        while (
+            position < len(self.vocabulary)
+            and len(matches) < SEARCH_MAX_PREFIX_EXPANSIONS
+            and self.vocabulary[position].startswith(term)
+        ):
+            token = self.vocabulary[position]
+            matches[token] = SEARCH_EXACT_SCORE if token == term else SEARCH_PREFIX_SCORE
+            position += 1
+
+        if (
+            len(term) >= SEARCH_FUZZY_MIN_TERM_LENGTH
+            and len(matches) < SEARCH_FUZZY_PREFIX_THRESHOLD
+        ):
+            grams = search_trigrams(term)
+            shared = Counter()
+            for gram in grams:
+                shared.update(self.trigrams.get(gram, ()))
+
+            max_edits = (
+                SEARCH_FUZZY_MAX_EDITS_LONG if len(term) >= SEARCH_FUZZY_LONG_TERM_LENGTH
+                else SEARCH_FUZZY_MAX_EDITS_SHORT
+            )
+            for token, count in shared.items():
+                if token in matches:
+                    continue
+                similarity = 2 * count / (len(grams) + self.trigram_counts[token])
+                if similarity >= SEARCH_FUZZY_MIN_SIMILARITY:
+                    matches[token] = SEARCH_FUZZY_SCORE * similarity
+                elif count >= 2 and search_edit_distance(term, token, max_edits) <= max_edits:
+                    matches[token] = SEARCH_FUZZY_SCORE * SEARCH_FUZZY_MIN_SIMILARITY
+
+        return matches
+
+    def search(self, query, limit=20):
+        """
+        Every query term has to match (exactly, as a prefix or fuzzily) in
+        one of the indexed fields. Stations are ranked by match quality
+        blended with their clickcount.
+        """
+        terms = list(dict.fromkeys(search_tokens(query)))
+        if not terms or limit <= 0:
+            return []
+
+        term_scores = []
+        for term in terms:
+            scores = {}
+            for token, quality in self.match_term(term).items():
+                for position, weight in self.postings[token].items():
+                    score = quality * weight
+                    if scores.get(position, 0) < score:
+                        scores[position] = score
+            if not scores:
+                return []
+            term_scores.append(scores)
+
+        term_scores.sort(key=len)
+        candidates = term_scores[0]
+        for scores in term_scores[1:]:
+            candidates = {
+                position: score + scores[position]
+                for position, score in candidates.items()
+                if position in scores
             }
-        })
+            if not candidates:
+                return []
+
+        ranked = heapq.nlargest(
+            limit,
+            candidates.items(),
+            key=lambda entry: entry[1] / len(terms) + self.popularity[entry[0]]
+        )
+        return [self.stations[position] for position, _ in ranked]
+
+def station_group_names(category, station):
+    _, field = STATION_BROWSE_CATEGORIES[category]
+    raw_value = station.get(field) or ""
+    values = raw_value.split(",") if field != "country" else [raw_value]
+    for value in values:
+        name = " ".join(value.split())
+        if name:
+            yield name if field == "country" else name.title()
+
+def build_station_browse_groups(stations):
+    """
+    Precompute the browse trees: per category the largest groups, each with
+    its station count and its top stations by clickcount. Groups are keyed
+    by their normalized name so 'Jazz' and 'jazz' tags end up together.
+    """
+    browse = {}
+    by_popularity = sorted(stations, key=StationSearchIndex.clickcount, reverse=True)
+
+    for category in STATION_BROWSE_CATEGORIES:
+        groups = {}
+        for station in by_popularity:
+            for name in set(station_group_names(category, station)):
+                key = normalize_search_text(name)
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = {"key": key, "name": name, "count": 0, "stations": []}
+                group["count"] += 1
+                if len(group["stations"]) < STATION_BROWSE_TOP_STATIONS:
+                    group["stations"].append(station)
+
+        largest = sorted(
+            (g for g in groups.values() if g["count"] >= STATION_BROWSE_MIN_STATIONS),
+            key=lambda g: (-g["count"], g["key"])
+        )[:STATION_BROWSE_MAX_GROUPS]
+        browse[category] = {
+            "groups": largest,
+            "by_key": {group["key"]: group for group in largest},
+        }
+
+    return browse
+
+def get_station_browse_groups(category):
+    return _STATION_CATALOG["browse"].get(category)
+
+def get_station_search_index():
+    return _STATION_CATALOG["index"]
+
+def search_station_catalog(query, limit):
+    """Search the local catalog; None when it is not loaded (yet)."""
+    index = get_station_search_index()
+    if index is None:
+        return None
+
+    started = time.perf_counter()
+    results = index.search(query, limit)
+    log_event(
+        "catalog", "debug", "Catalog search '{query}': {count} results in {ms:.1f} ms",
+        query=query, count=len(results), ms=(time.perf_counter() - started) * 1000
+    )
+    return results
+
+def find_stations(query, limit):
+    """
+    Search the catalog and fill up with radio-browser's substring search when
+    it finds too little. Returns (stations, source): "catalog" or the mirror.
+    """
+    stations = search_station_catalog(query, limit)
+    if stations is not None and len(stations) >= min(limit, SEARCH_CATALOG_MIN_RESULTS):
+        return stations, VTUNER_CATALOG_SOURCE
+
+    try:
+        found, mirror = radio_browser_fetch("stations/search", {
+            "name": query,
+            "limit": limit,
+            "hidebroken": "true",
+            "order": "clickcount",
+            "reverse": "true"
+        }, timeout=5)
     except Exception as e:
-        log_debug(f"Error fetching current track: {e}")
-        return jsonify({"error": str(e)}), 500
+        if not stations:
+            raise
+        log_event("catalog", "warning", "radio-browser search for '{query}' failed, catalog results only: {error}", query=query, error=e)
+        return stations, VTUNER_CATALOG_SOURCE
+
+    merged = list(stations or [])
+    seen = {station.get("stationuuid") for station in merged}
+    merged += [station for station in found or [] if station.get("stationuuid") not in seen]
+    return merged[:limit], mirror
+
+def load_station_catalog():
+    stations = radio_browser_request("stations/search", {
+        "limit": STATION_CATALOG_SIZE,
+        "hidebroken": "true",
+        "order": "clickcount",
+        "reverse": "true"
+    }, timeout=60, hedge=False)
+    # An empty answer would hide every search result until the next refresh.
+    if not stations:
+        raise RuntimeError("radio-browser returned no stations for the catalog")
+
+    install_station_catalog(stations)
+    try:
+        write_json_atomic(STATION_CATALOG_FILE, stations)
+        STATE.set("station_catalog_version", time.time())
+        # Earlier versions kept the catalog in the state database.
+        STATE.cache_delete("station_catalog", "stations")
+    except Exception as e:
+        log_event("catalog", "warning", "Could not persist station catalog: {error}", error=e)
+    return get_station_search_index()
+
+def read_station_catalog_file():
+    try:
+        with open(STATION_CATALOG_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def install_station_catalog(stations):
+    index = StationSearchIndex(stations)
+    browse = build_station_browse_groups(index.stations)
+    _STATION_CATALOG["index"] = index
+    _STATION_CATALOG["browse"] = browse
+    _STATION_CATALOG["loaded_at"] = time.time()
+    log_event("catalog", "info", "Loaded station catalog: {stations} stations, {tokens} tokens", stations=len(index), tokens=len(index.vocabulary))
+    return index
+
+def station_catalog_worker():
+    # The persisted catalog (from a previous run, or refreshed by another
+    # worker process) makes search and browsing available right away and is
+    # installed again whenever a new copy lands. Only the background leader
+    # fetches a fresh copy, once the persisted one is due.
+    installed_version = None
+
+    while True:
+        sleep_seconds = STATION_CATALOG_CHECK_INTERVAL
+        try:
+            version = STATE.get("station_catalog_version")
+            if version and version != installed_version:
+                stations = read_station_catalog_file()
+                if stations:
+                    install_station_catalog(stations)
+                else:
+                    version = None  # no file yet: fetch one
+                installed_version = version
+
+            if is_background_leader() and time.time() - (version or 0) >= STATION_CATALOG_REFRESH_INTERVAL:
+                load_station_catalog()
+                installed_version = STATE.get("station_catalog_version")
+        except Exception as e:
+            log_event("catalog", "warning", "Station catalog load failed: {error}", error=e)
+            sleep_seconds = STATION_CATALOG_RETRY_INTERVAL
+
+        time.sleep(sleep_seconds)
+
+def start_station_catalog_worker():
+    global _STATION_CATALOG_WORKER_STARTED
+
+    if not STATION_CATALOG_SIZE:
+        return
+
+    with _STATION_CATALOG_WORKER_LOCK:
+        if _STATION_CATALOG_WORKER_STARTED:
+            return
+
+        thread = threading.Thread(
+            target=station_catalog_worker,
+            daemon=True,
+            name="station-catalog"
+        )
+        thread.start()
+        _STATION_CATALOG_WORKER_STARTED = True
 
 
 # ============ VTUNER SERVICE EMULATION ============
@@ -1663,16 +4811,22 @@ def spotify_current():
 
 VTUNER_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>'
 VTUNER_PAGE_SIZE_LIMIT = 100
-RADIO_BROWSER_MIRRORS = [
-    "https://de2.api.radio-browser.info/json",
-    "https://de1.api.radio-browser.info/json",
-]
+# The AVR pages through a listing with one request per page; the full result
+# list of a query is kept this long so every page comes from the same set.
+VTUNER_RESULT_CACHE_TTL = 300
+VTUNER_RESULT_CACHE_MAX_ENTRIES = 32
+VTUNER_CATALOG_SOURCE = "catalog"
+# radio-browser stations recently handed to the AVR, by vTuner station id, so
+# the statxml lookup on station select needs no network call.
+VTUNER_STATION_INDEX_TTL = 24 * 3600
+VTUNER_STATION_INDEX_MAX_ENTRIES = 5000
 
 def vtuner_bogus_parameter(url):
     # AVRs blindly append '&mac=...&dlang=...' to menu URLs, so every URL
     # handed to the AVR needs an existing query string to stay parseable.
     return url + "?vtuner=true"
 
+@traced("xml")
 def vtuner_xml_response(root):
     body = VTUNER_XML_HEADER + ET.tostring(root, encoding="unicode")
     return app.response_class(body, mimetype="text/xml")
@@ -1715,8 +4869,13 @@ def vtuner_search_item(caption, destination):
     ET.SubElement(item, "SearchButtonCancel").text = "Cancel"
     return item
 
+def vtuner_logo_url(source_url):
+    if not source_url or not source_url.lower().startswith(("http://", "https://")):
+        return None
+    return vtuner_url(f"/art?url={quote(source_url, safe='')}&size={ART_DEFAULT_SIZE}")
+
 def vtuner_station_item(uid, name, stream_url, description="", genre="",
-                        location="", mime="MP3", bitrate=""):
+                        location="", mime="MP3", bitrate="", logo=None):
     playback_url = get_playback_url(stream_url)
     if playback_url and playback_url.lower().startswith("https://"):
         # The AVR cannot do TLS; the proxy normally handles this, but be
@@ -1729,7 +4888,7 @@ def vtuner_station_item(uid, name, stream_url, description="", genre="",
     ET.SubElement(item, "StationName").text = name or "Unknown station"
     ET.SubElement(item, "StationUrl").text = playback_url
     ET.SubElement(item, "StationDesc").text = description
-    ET.SubElement(item, "Logo").text = None
+    ET.SubElement(item, "Logo").text = vtuner_logo_url(logo)
     ET.SubElement(item, "StationFormat").text = genre
     ET.SubElement(item, "StationLocation").text = location
     ET.SubElement(item, "StationBandWidth").text = str(bitrate or "")
@@ -1768,62 +4927,88 @@ def vtuner_url(path):
 def favorite_station_id(favorite):
     return "fav" + hashlib.md5(favorite["url"].encode("utf-8")).hexdigest()[:12]
 
+_VTUNER_STATION_INDEX = ExpiringLRUCache(VTUNER_STATION_INDEX_MAX_ENTRIES, VTUNER_STATION_INDEX_TTL, "vtuner_station_index")
+
 def favorite_to_vtuner_item(favorite):
     return vtuner_station_item(
         uid=favorite_station_id(favorite),
         name=favorite.get("name"),
         stream_url=favorite["url"],
         description=favorite.get("name") or "",
-        bitrate=favorite.get("bitrate") or ""
+        bitrate=favorite.get("bitrate") or "",
+        logo=favorite.get("favicon")
     )
 
-def radio_browser_request(path, params=None):
-    last_error = None
-    for mirror in RADIO_BROWSER_MIRRORS:
-        try:
-            resp = requests.get(
-                f"{mirror}/{path}",
-                params=params,
-                headers={"User-Agent": "denonAVR-vTuner/1.0"},
-                timeout=6
-            )
-            resp.raise_for_status()
-            return resp.json()
-        except Exception as e:
-            log_debug(f"radio-browser mirror {mirror} failed: {e}")
-            last_error = e
-    raise last_error
+_VTUNER_RESULT_CACHE = ExpiringLRUCache(VTUNER_RESULT_CACHE_MAX_ENTRIES, VTUNER_RESULT_CACHE_TTL, "vtuner_results")
+
+def vtuner_cached_stations(listing, query, fetch):
+    """
+    Full station list for a vTuner listing, cached per (listing, query,
+    source) where source is the radio-browser mirror or the local catalog
+    that produced it. fetch() returns (stations, source) and only runs when
+    no source has a live entry, so page 2 onward never re-queries and never
+    shifts when radio-browser's ranking moves in between.
+    """
+    query = normalize_search_text(query).strip()
+    for source in (VTUNER_CATALOG_SOURCE, *RADIO_BROWSER.mirrors()):
+        stations = _VTUNER_RESULT_CACHE.peek((listing, query, source))
+        if stations is not None:
+            _VTUNER_RESULT_CACHE.record(hit=True)
+            log_event("vtuner", "debug", "vTuner {listing} '{query}' served from cached {source} results", listing=listing, query=query, source=source)
+            return stations
+
+    _VTUNER_RESULT_CACHE.record(hit=False)
+    stations, source = fetch()
+    _VTUNER_RESULT_CACHE.set((listing, query, source), stations)
+    return stations
 
 def radio_browser_to_vtuner_item(station):
+    uid = "rb" + station.get("stationuuid", "")
+    _VTUNER_STATION_INDEX.set(uid, station)
     return vtuner_station_item(
-        uid="rb" + station.get("stationuuid", ""),
+        uid=uid,
         name=station.get("name"),
         stream_url=station.get("url_resolved") or station.get("url"),
         description=station.get("name") or "",
         genre=(station.get("tags") or "").split(",")[0],
         location=station.get("country") or "",
         mime=station.get("codec") or "MP3",
-        bitrate=station.get("bitrate") or ""
+        bitrate=station.get("bitrate") or "",
+        logo=station.get("favicon")
     )
 
+def find_radio_browser_station(station_id):
+    """Look up an 'rb…' id in memory first: served lists, then the catalog."""
+    station = _VTUNER_STATION_INDEX.get(station_id)
+    if station is not None:
+        return station
+
+    catalog = get_station_search_index()
+    if catalog is not None:
+        station = catalog.by_uuid.get(station_id[2:])
+        if station is not None:
+            return station
+
+    log_event("vtuner", "debug", "vTuner station {station_id} not indexed, asking radio-browser", station_id=station_id)
+    stations = radio_browser_request(f"stations/byuuid/{station_id[2:]}")
+    return stations[0] if stations else None
+
 def find_vtuner_station_item(station_id):
     if station_id.startswith("fav"):
-        for favorite in load_favorites():
-            if favorite_station_id(favorite) == station_id:
-                return favorite_to_vtuner_item(favorite)
-        return None
+        favorite = FAVORITES.get_by_station_id(station_id)
+        return favorite_to_vtuner_item(favorite) if favorite else None
 
     if station_id.startswith("rb"):
-        stations = radio_browser_request(f"stations/byuuid/{station_id[2:]}")
-        if stations:
-            return radio_browser_to_vtuner_item(stations[0])
+        station = find_radio_browser_station(station_id)
+        if station:
+            return radio_browser_to_vtuner_item(station)
 
     return None
 
 @app.route('/setupapp/<path:subpath>', methods=['GET', 'POST'])
 def vtuner_setupapp(subpath):
     lowered = subpath.lower()
-    log_debug(f"vTuner request: /setupapp/{subpath} args={dict(request.args)}")
+    log_event("vtuner", "debug", "vTuner request: /setupapp/{subpath} args={args}", subpath=subpath, args=request.args.to_dict())
 
     if request.args.get("token") == "0":
         return app.response_class(
@@ -1843,8 +5028,7 @@ def vtuner_setupapp(subpath):
     if "loginxml" in lowered or "navxml" in lowered:
         return vtuner_landing()
 
-    print(f"[vTuner] Unhandled request: /setupapp/{subpath} args={dict(request.args)}",
-          file=sys.stderr)
+    log_event("vtuner", "error", "Unhandled request: /setupapp/{subpath} args={args}", subpath=subpath, args=request.args.to_dict())
     return vtuner_display_page("Not supported")
 
 @app.route('/vtuner/', methods=['GET', 'POST'])
@@ -1855,6 +5039,12 @@ def vtuner_landing():
         vtuner_search_item("Search stations", vtuner_url("/vtuner/search")),
         vtuner_dir_item("Most Popular", vtuner_url("/vtuner/popular"), VTUNER_PAGE_SIZE_LIMIT),
     ]
+    for category, (title, _) in STATION_BROWSE_CATEGORIES.items():
+        browse = get_station_browse_groups(category)
+        if browse and browse["groups"]:
+            items.append(vtuner_dir_item(
+                title, vtuner_url(f"/vtuner/browse/{category}"), len(browse["groups"])
+            ))
     return vtuner_page(items)
 
 @app.route('/vtuner/favorites', methods=['GET', 'POST'])
@@ -1869,19 +5059,16 @@ def vtuner_favorites():
 @app.route('/vtuner/search', methods=['GET', 'POST'])
 def vtuner_search():
     query = (request.args.get("search") or "").strip()
-    if len(query) < 3:
+    # The local catalog answers instantly, so short queries are fine there;
+    # radio-browser's substring search needs a few characters to be useful.
+    min_length = 1 if get_station_search_index() is not None else 3
+    if len(query) < min_length:
         return vtuner_display_page("Search query too short")
 
     try:
-        stations = radio_browser_request("stations/search", {
-            "name": query,
-            "limit": VTUNER_PAGE_SIZE_LIMIT,
-            "hidebroken": "true",
-            "order": "clickcount",
-            "reverse": "true"
-        })
+        stations = vtuner_cached_stations("search", query, lambda: find_stations(query, VTUNER_PAGE_SIZE_LIMIT))
     except Exception as e:
-        log_debug(f"vTuner search failed: {e}")
+        log_event("vtuner", "warning", "vTuner search failed: {error}", error=e)
         return vtuner_display_page("Search failed")
 
     if not stations:
@@ -1893,26 +5080,54 @@ def vtuner_search():
 @app.route('/vtuner/popular', methods=['GET', 'POST'])
 def vtuner_popular():
     try:
-        stations = radio_browser_request("stations/search", {
+        stations = vtuner_cached_stations("popular", "", lambda: radio_browser_fetch("stations/search", {
             "limit": VTUNER_PAGE_SIZE_LIMIT,
             "hidebroken": "true",
             "order": "clickcount",
             "reverse": "true"
-        })
+        }))
     except Exception as e:
-        log_debug(f"vTuner popular failed: {e}")
+        log_event("vtuner", "warning", "vTuner popular failed: {error}", error=e)
         return vtuner_display_page("Could not load stations")
 
     items = [radio_browser_to_vtuner_item(s) for s in vtuner_paged(stations, request.args)]
     return vtuner_page(items, total_count=len(stations))
 
+@app.route('/vtuner/browse/<category>', methods=['GET', 'POST'])
+def vtuner_browse(category):
+    browse = get_station_browse_groups(category)
+    if not browse or not browse["groups"]:
+        return vtuner_display_page("Station list not loaded yet")
+
+    groups = browse["groups"]
+    items = [
+        vtuner_dir_item(
+            group["name"],
+            vtuner_url(f"/vtuner/browse/{category}/{quote(group['key'], safe='')}"),
+            len(group["stations"])
+        )
+        for group in vtuner_paged(groups, request.args)
+    ]
+    return vtuner_page(items, total_count=len(groups))
+
+@app.route('/vtuner/browse/<category>/<path:group_key>', methods=['GET', 'POST'])
+def vtuner_browse_group(category, group_key):
+    browse = get_station_browse_groups(category)
+    group = browse["by_key"].get(group_key) if browse else None
+    if group is None:
+        return vtuner_display_page("No stations found")
+
+    stations = group["stations"]
+    items = [radio_browser_to_vtuner_item(s) for s in vtuner_paged(stations, request.args)]
+    return vtuner_page(items, total_count=len(stations))
+
 @app.route('/vtuner/station', methods=['GET', 'POST'])
 def vtuner_station_info():
     station_id = request.args.get("id") or ""
     try:
         item = find_vtuner_station_item(station_id)
     except Exception as e:
-        log_debug(f"vTuner station lookup failed for '{station_id}': {e}")
+        log_event("vtuner", "warning", "vTuner station lookup failed for '{station_id}': {error}", station_id=station_id, error=e)
         item = None
 
     if item is None:
@@ -1920,5 +5135,274 @@ def vtuner_station_info():
     return vtuner_page([item])
 
 
+# ============ REQUEST TIMING & PROFILING ============
+# Every response carries a Server-Timing header with the spans collected
+# while handling it (AVR, SOAP, SSDP, radio-browser, Spotify, XML, ...), so
+# browser dev tools show where the time went. The slowest requests are kept
+# for /api/debug/slow_requests. With DEBUG_API_TOKEN set,
+# POST /api/debug/profile samples all thread stacks for a while and returns
+# the aggregated profile (JSON, or ?format=collapsed for flame graph tools).
+SLOW_REQUEST_LOG_SIZE = 20
+SERVER_TIMING_MAX_ENTRIES = 20
+PROFILE_DEFAULT_SECONDS = 10
+PROFILE_MAX_SECONDS = 120
+PROFILE_SAMPLE_INTERVAL = 0.01
+PROFILE_TOP_FUNCTIONS = 50
+DEBUG_API_TOKEN = os.getenv("DEBUG_API_TOKEN")
+
+_SLOW_REQUESTS = []  # min-heap of (seconds, sequence, entry)
+_SLOW_REQUESTS_LOCK = threading.Lock()
+_SLOW_REQUESTS_SEQUENCE = itertools.count()
+_PROFILE_LOCK = threading.Lock()
+
+def summarize_spans(spans):
+    """Sum spans per (name, desc), slowest first."""
+    totals = {}
+    for name, desc, seconds in spans:
+        total = totals.setdefault((name, desc), [0.0, 0])
+        total[0] += seconds
+        total[1] += 1
+    return sorted(
+        ((name, desc, seconds, count) for (name, desc), (seconds, count) in totals.items()),
+        key=lambda entry: -entry[2]
+    )
+
+def format_server_timing(spans, total_seconds):
+    entries = []
+    for name, desc, seconds, count in summarize_spans(spans)[:SERVER_TIMING_MAX_ENTRIES]:
+        if count > 1:
+            desc = f"{desc or name} x{count}"
+        entry = f"{name};dur={seconds * 1000:.1f}"
+        if desc:
+            entry += f';desc="{escape_metric_label(desc)}"'
+        entries.append(entry)
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
+
+def record_slow_request(seconds, entry):
+    item = (seconds, next(_SLOW_REQUESTS_SEQUENCE), entry)
+    with _SLOW_REQUESTS_LOCK:
+        if len(_SLOW_REQUESTS) < SLOW_REQUEST_LOG_SIZE:
+            heapq.heappush(_SLOW_REQUESTS, item)
+        elif seconds > _SLOW_REQUESTS[0][0]:
+            heapq.heapreplace(_SLOW_REQUESTS, item)
+
+@app.before_request
+def start_request_timing():
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+    _REQUEST_SPANS.spans = []
+    _REQUEST_SPANS.started = time.perf_counter()
+
+@app.after_request
+def add_server_timing_header(response):
+    spans = getattr(_REQUEST_SPANS, "spans", None)
+    if spans is not None:
+        elapsed = time.perf_counter() - _REQUEST_SPANS.started
+        response.headers["Server-Timing"] = format_server_timing(spans, elapsed)
+    return response
+
+@app.teardown_request
+def finish_request_timing(_error=None):
+    HTTP_REQUESTS_IN_FLIGHT.dec()
+    spans = getattr(_REQUEST_SPANS, "spans", None)
+    if spans is None:
+        return
+    _REQUEST_SPANS.spans = None
+
+    elapsed = time.perf_counter() - _REQUEST_SPANS.started
+    record_slow_request(elapsed, {
+        "at": time.time(),
+        "method": request.method,
+        "path": request.path,
+        "ms": round(elapsed * 1000, 1),
+        "spans": [
+            {"name": name, "desc": desc, "ms": round(seconds * 1000, 1), "count": count}
+            for name, desc, seconds, count in summarize_spans(spans)
+        ]
+    })
+
+@app.route('/api/debug/slow_requests')
+def api_slow_requests():
+    with _SLOW_REQUESTS_LOCK:
+        worst = sorted(_SLOW_REQUESTS, reverse=True)
+    return jsonify([entry for _, _, entry in worst])
+
+def debug_api_authorized():
+    # Header only: a ?token= query string ends up in access logs and proxy logs.
+    scheme, _, supplied = request.headers.get("Authorization", "").partition(" ")
+    if not DEBUG_API_TOKEN or scheme.lower() != "bearer":
+        return False
+    # WSGI hands header values over as latin-1 decoded bytes.
+    return hmac.compare_digest(supplied.strip().encode("latin-1"), DEBUG_API_TOKEN.encode())
+
+def sample_thread_stacks(seconds, interval=PROFILE_SAMPLE_INTERVAL):
+    """Sample every other thread's stack; returns (Counter of stacks, sample count)."""
+    own_thread = threading.get_ident()
+    stacks = Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stacks[tuple(reversed(stack))] += 1
+        samples += 1
+        time.sleep(interval)
+
+    return stacks, samples
+
+def summarize_profile(stacks):
+    self_counts = Counter()
+    total_counts = Counter()
+    for stack, count in stacks.items():
+        self_counts[stack[-1]] += count
+        for function in set(stack):
+            total_counts[function] += count
+    return [
+        {"function": function, "total": total, "self": self_counts[function]}
+        for function, total in total_counts.most_common(PROFILE_TOP_FUNCTIONS)
+    ]
+
+@app.route('/api/debug/profile', methods=['POST'])
+def api_debug_profile():
+    if not DEBUG_API_TOKEN:
+        return jsonify({"error": "Profiling is disabled; set DEBUG_API_TOKEN"}), 404
+    if not debug_api_authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        seconds = float(request.args.get('seconds', PROFILE_DEFAULT_SECONDS))
+    except ValueError:
+        return jsonify({"error": "Invalid seconds"}), 400
+    seconds = max(1.0, min(seconds, PROFILE_MAX_SECONDS))
+
+    if not _PROFILE_LOCK.acquire(blocking=False):
+        return jsonify({"error": "A profile is already being taken"}), 409
+    try:
+        stacks, samples = sample_thread_stacks(seconds)
+    finally:
+        _PROFILE_LOCK.release()
+
+    if request.args.get('format') == 'collapsed':
+        lines = [f"{';'.join(stack)} {count}" for stack, count in stacks.most_common()]
+        return app.response_class("\n".join(lines) + "\n", mimetype='text/plain')
+
+    return jsonify({
+        "seconds": seconds,
+        "samples": samples,
+        "interval": PROFILE_SAMPLE_INTERVAL,
+        "functions": summarize_profile(stacks)
+    })
+
+
+# ============ WARM-UP & HEALTH ============
+# Background workers and the slow first lookups (AVR status, UPnP discovery,
+# radio-browser mirrors, the Spotify token, the station catalog) start at
+# boot, in parallel and off the request path. /healthz answers as soon as the
+# process serves requests; /readyz turns 200 once warm-up has finished.
+# WARMUP_ON_START=false skips all of it (for tools that only import app.py);
+# background workers then do not run.
+WARMUP_ON_START = get_env_bool("WARMUP_ON_START", True)
+WARMUP_CATALOG_WAIT = 30
+
+_PROCESS_STARTED_AT = time.time()
+_WARMUP = {"started_at": None, "finished_at": None, "steps": {}}
+_WARMUP_LOCK = threading.Lock()
+
+def warm_avr_status():
+    if get_avr_status() is None:
+        raise RuntimeError(f"AVR at {DENON_IP} did not answer")
+
+def warm_station_catalog():
+    start_station_catalog_worker()
+    deadline = time.monotonic() + WARMUP_CATALOG_WAIT
+    while get_station_search_index() is None:
+        if time.monotonic() > deadline:
+            raise TimeoutError("Station catalog not loaded yet, search uses radio-browser meanwhile")
+        time.sleep(0.2)
+
+def warm_spotify():
+    if get_spotify_client() is None:
+        raise RuntimeError("Not authenticated with Spotify")
+
+def warmup_steps():
+    steps = [
+        ("background_leader", BACKGROUND_LEADER.start),
+        ("radio_browser_mirrors", RADIO_BROWSER.mirrors),
+        ("static_assets", STATIC_ASSETS.load_all),
+    ]
+    if DENON_IP:
+        steps += [
+            ("avr_status", warm_avr_status),
+            ("upnp_discovery", discover_avtransport_control_url),
+            ("display_worker", start_denon_display_metadata_worker),
+        ]
+    if STATION_CATALOG_SIZE:
+        steps.append(("station_catalog", warm_station_catalog))
+    if SPOTIFY_CONFIGURED:
+        steps.append(("spotify", warm_spotify))
+    return steps
+
+def run_warmup_step(name, step):
+    started = time.monotonic()
+    result = {"ok": True}
+    try:
+        step()
+    except Exception as e:
+        log_event("warmup", "warning", "Warm-up step {name} failed: {error}", name=name, error=e)
+        result = {"ok": False, "error": str(e)}
+    result["seconds"] = round(time.monotonic() - started, 3)
+    with _WARMUP_LOCK:
+        _WARMUP["steps"][name] = result
+
+def run_warmup():
+    steps = warmup_steps()
+    with ThreadPoolExecutor(max_workers=len(steps), thread_name_prefix="warmup") as executor:
+        for name, step in steps:
+            executor.submit(run_warmup_step, name, step)
+    with _WARMUP_LOCK:
+        _WARMUP["finished_at"] = time.time()
+    log_event("warmup", "info", "Warm-up finished in {seconds:.1f}s", seconds=_WARMUP["finished_at"] - _WARMUP["started_at"])
+
+def start_warmup():
+    with _WARMUP_LOCK:
+        if _WARMUP["started_at"] is not None:
+            return
+        _WARMUP["started_at"] = time.time()
+    threading.Thread(target=run_warmup, daemon=True, name="warmup").start()
+
+@app.route('/metrics')
+def metrics():
+    return app.response_class(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz')
+def healthz():
+    return jsonify({"status": "alive", "uptime": round(time.time() - _PROCESS_STARTED_AT, 1)})
+
+@app.route('/readyz')
+def readyz():
+    if not WARMUP_ON_START:
+        return jsonify({"ready": True, "warmup": "disabled"})
+
+    with _WARMUP_LOCK:
+        ready = _WARMUP["finished_at"] is not None
+        body = {
+            "ready": ready,
+            "started_at": _WARMUP["started_at"],
+            "finished_at": _WARMUP["finished_at"],
+            "steps": dict(_WARMUP["steps"])
+        }
+    return jsonify(body), 200 if ready else 503
+
+# With the debug reloader, only the child process that serves requests warms up.
+if WARMUP_ON_START and (__name__ != '__main__' or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
+    start_warmup()
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
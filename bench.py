@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the pure-Python hot paths in app.py.
+
+    python bench.py --save       # record a baseline on this machine (bench_baseline.json)
+    python bench.py              # run and compare with that baseline
+    python bench.py -k vtuner    # only the cases whose name contains "vtuner"
+
+Each case reports the best per-call time over several timed repeats. A case
+that is more than --threshold (default 25%) slower than its baseline is
+measured again, and flagged as a regression (exit status 1) if it stays slow.
+Baselines depend on the machine and the Python version, so bench_baseline.json
+is local and not committed: record it (--save) before a change, compare after.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+
+# app.py reads its configuration at import time: no warm-up (no network, no
+# background workers), a throwaway state database, and a fixed host address
+# so get_playback_url does not probe the network.
+_BENCH_DIR = tempfile.mkdtemp(prefix="denon-vtuner-bench-")
+os.environ.update({
+    "WARMUP_ON_START": "false",
+    "STATE_DB_FILE": os.path.join(_BENCH_DIR, "state.db"),
+    "HOST_IP": "192.168.1.10",
+    "HOST_PORT": "8877",
+    "DEBUG": "false",
+})
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+ICY_BLOCK_MAX = 255 * 16  # the length byte counts 16-byte units
+
+# ============ INPUTS ============
+
+def icy_block(text, encoding="utf-8"):
+    """A full-size ICY metadata block: StreamTitle, a long StreamUrl, NUL padding."""
+    payload = (
+        b"StreamTitle='" + text.encode(encoding) + b"';"
+        + b"StreamUrl='https://cdn.example.com/now-playing/" + b"a1b2c3d4" * 60 + b"';"
+    )
+    return payload + b"\x00" * (ICY_BLOCK_MAX - len(payload))
+
+ICY_UTF8 = icy_block("Die Ärzte & Björk – Ünïcödé Sông Tïtlé (Extended Remix) feat. Sigur Rós")
+ICY_LATIN1 = icy_block("Björk & Sigur Rós - Hyperballad (Live à Paris, Remasterisé)", "latin-1")
+ICY_ENTITIES = icy_block("Simon &amp; Garfunkel - The Sound of Silence &#8211; Live")
+NOW_PLAYING = "Die Ärzte & Björk - Ünïcödé Sông Tïtlé (Extended Remix) feat. Sigur Rós"
+
+HTTPS_STREAM = "https://icecast.example.org/radio/classic-fm-128.mp3?listenerid=abc&aw_0_1st.playerid=web"
+PROXIED_STREAM = app.get_playback_url(HTTPS_STREAM)
+
+def radio_browser_station(n):
+    return {
+        "stationuuid": f"9617a958-0601-11e8-ae97-52543be{n:05d}",
+        "name": f"Radio Station Nummer {n} – Klassik & Jazz ({n % 7} kbit)",
+        "url": f"http://stream{n}.example.net:8000/live",
+        "url_resolved": f"https://stream{n}.example.net/live.mp3",
+        "favicon": f"https://stream{n}.example.net/favicon-{n}.png",
+        "tags": "classical,jazz,news,talk",
+        "country": "Netherlands",
+        "codec": "MP3",
+        "bitrate": 128,
+    }
+
+STATIONS_100 = [radio_browser_station(n) for n in range(100)]
+STATIONS_1000 = [radio_browser_station(n) for n in range(1000)]
+FAVORITES_1000 = [
+    {
+        "name": station["name"],
+        "url": station["url_resolved"],
+        "favicon": station["favicon"],
+        "bitrate": station["bitrate"],
+        "countrycode": "NL",
+    }
+    for station in STATIONS_1000
+]
+PAGE_ARGS = {"startitems": "401", "enditems": "500", "mac": "0005cd123456", "dlang": "eng"}
+
+def make_favorites_store():
+    favorites_file = os.path.join(_BENCH_DIR, "favorites.json")
+    store = app.FavoritesStore(app.StateStore(os.path.join(_BENCH_DIR, "favorites.db")), favorites_file)
+    store.replace(FAVORITES_1000)
+    return store
+
+FAVORITES_STORE = make_favorites_store()
+FAVORITE_IDS = [app.favorite_station_id(favorite) for favorite in FAVORITES_1000[::50]]
+
+def lookup_favorites():
+    for station_id in FAVORITE_IDS:
+        FAVORITES_STORE.get_by_station_id(station_id)
+
+# ============ CASES ============
+
+CASES = {
+    "parse_stream_title_utf8": lambda: app.parse_stream_title(ICY_UTF8),
+    "parse_stream_title_latin1": lambda: app.parse_stream_title(ICY_LATIN1),
+    "parse_stream_title_entities": lambda: app.parse_stream_title(ICY_ENTITIES),
+    "split_now_playing": lambda: app.split_now_playing(NOW_PLAYING),
+    "build_didl_lite": lambda: app.build_didl_lite(PROXIED_STREAM, "Classic FM", NOW_PLAYING, "Die Ärzte & Björk"),
+    "build_avtransport_action_body": lambda: app.build_avtransport_action_body("SetAVTransportURI", {
+        "CurrentURI": PROXIED_STREAM,
+        "CurrentURIMetaData": app.build_didl_lite(PROXIED_STREAM, "Classic FM", NOW_PLAYING),
+    }),
+    "vtuner_page_100_stations": lambda: app.vtuner_page(
+        [app.radio_browser_to_vtuner_item(station) for station in STATIONS_100]
+    ),
+    "vtuner_page_100_favorites": lambda: app.vtuner_page(
+        [app.favorite_to_vtuner_item(favorite) for favorite in FAVORITES_1000[:100]]
+    ),
+    "vtuner_paged_1000": lambda: app.vtuner_paged(STATIONS_1000, PAGE_ARGS),
+    "unwrap_proxy_url": lambda: app.unwrap_proxy_url(PROXIED_STREAM),
+    "get_playback_url_https": lambda: app.get_playback_url(HTTPS_STREAM),
+    "get_playback_url_http": lambda: app.get_playback_url("http://stream.example.net:8000/live"),
+    "favorites_lookup_by_station_id_1000": lookup_favorites,
+}
+
+# ============ RUNNER ============
+
+def measure(func, repeat):
+    """Best seconds per call over `repeat` runs of an auto-sized loop (>= 0.2 s each)."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def load_baseline():
+    try:
+        with open(BASELINE_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def format_us(seconds):
+    return f"{seconds * 1e6:10.2f}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-k", dest="keyword", help="only run cases whose name contains this")
+    parser.add_argument("--save", action="store_true", help="record the results as the new baseline")
+    parser.add_argument("--repeat", type=int, default=5, help="timed repeats per case (default 5)")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="slowdown that counts as a regression (default 0.25 = 25%%)")
+    args = parser.parse_args()
+
+    baseline = load_baseline() or {}
+    baseline_cases = baseline.get("cases", {})
+    selected = {name: case for name, case in CASES.items() if not args.keyword or args.keyword in name}
+
+    # vtuner_* build absolute URLs from the request, as when the AVR asks.
+    context = app.app.test_request_context(
+        "/setupapp/Denon/asp/BrowseXml/navXML.asp?vtuner=true", base_url="http://192.168.1.10"
+    )
+    context.push()
+
+    print(f"{'case':40} {'us/call':>10} {'baseline':>10} {'change':>8}")
+    results = {}
+    regressions = []
+    for name, case in selected.items():
+        seconds = measure(case, args.repeat)
+        reference = baseline_cases.get(name)
+        if reference and seconds / reference - 1 > args.threshold:
+            # Confirm before flagging: a single noisy run should not count.
+            seconds = min(seconds, measure(case, args.repeat * 2))
+        results[name] = seconds
+
+        change = ""
+        flag = ""
+        if reference:
+            ratio = seconds / reference - 1
+            change = f"{ratio:+7.1%}"
+            if ratio > args.threshold:
+                flag = "  REGRESSION"
+                regressions.append(name)
+        print(f"{name:40} {format_us(seconds)} {format_us(reference) if reference else ' ' * 10} {change:>8}{flag}")
+
+    context.pop()
+
+    if args.save:
+        cases = dict(baseline_cases, **results)
+        with open(BASELINE_FILE, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cases": dict(sorted(cases.items())),
+            }, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {os.path.basename(BASELINE_FILE)}")
+    elif not baseline_cases:
+        print("No baseline yet: run with --save to record one")
+    elif regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -36,6 +36,14 @@ function createElement(tagName, options = {}, children = []) {
     return element;
 }
 
+// Third-party images go through the app's /art cache (fetched once, resized).
+function artUrl(url, size = 150) {
+    if (!url || !/^https?:\/\//i.test(url)) {
+        return url;
+    }
+    return `/art?url=${encodeURIComponent(url)}&size=${size}`;
+}
+
 function setPanelMessage(container, text, color = 'var(--text-secondary)') {
     container.replaceChildren(createElement('div', {
         text,
@@ -395,7 +403,7 @@ async function showStationInfo(station) {
     // Fill Static Data
     title.textContent = station.name;
     if (station.favicon) {
-        logo.src = station.favicon;
+        logo.src = artUrl(station.favicon, 300);
         logo.style.display = 'block';
     } else {
         logo.style.display = 'none';
@@ -482,7 +490,7 @@ function renderFavorites() {
 
         const imageBox = createElement('div', { className: 'fav-card-image' });
         if (station.favicon) {
-            const image = createElement('img', { src: station.favicon, alt: '' });
+            const image = createElement('img', { src: artUrl(station.favicon), alt: '' });
             image.addEventListener('error', () => imageBox.replaceChildren('📻'));
             imageBox.appendChild(image);
         } else {
@@ -640,7 +648,7 @@ function renderResults(data) {
         });
         if (station.favicon) {
             const logo = createElement('img', {
-                src: station.favicon,
+                src: artUrl(station.favicon, 64),
                 alt: '',
                 style: {
                     width: '32px',
@@ -998,7 +1006,7 @@ async function updateSpotifyNowPlaying() {
 
         if (data.track) {
             controls.style.display = 'block';
-            artEl.src = data.track.image_url || '';
+            artEl.src = artUrl(data.track.image_url, 300) || '';
             trackEl.textContent = data.track.name || 'Unknown Track';
             artistEl.textContent = data.track.artists || 'Unknown Artist';
 
@@ -1219,7 +1227,7 @@ function renderSpotifyPlaylists() {
         });
         const media = playlist.image_url
             ? createElement('img', {
-                src: playlist.image_url,
+                src: artUrl(playlist.image_url, 300),
                 alt: '',
                 style: {
                     width: '100%',
@@ -1282,6 +1290,10 @@ function renderSpotifyPlaylists() {
     spotifyContent.replaceChildren(toolbar, grid);
 }
 
+const SPOTIFY_TRACKS_PAGE_SIZE = 100;
+let currentSpotifyTracksLoad = null;
+let spotifyTracksObserver = null;
+
 async function showSpotifyPlaylist(playlistId, playlistName, playlistUri, trackCount) {
     const modal = document.getElementById('spotify-tracks-modal');
     const title = document.getElementById('spotify-modal-title');
@@ -1306,123 +1318,182 @@ async function showSpotifyPlaylist(playlistId, playlistName, playlistUri, trackC
         modal.style.display = 'none';
     };
 
-    // Load tracks
-    try {
-        const res = await fetch(`/api/spotify/playlist/${encodeURIComponent(playlistId)}/tracks`);
-        const tracks = await res.json();
+    // Load tracks: the first page right away, further pages when the end of
+    // the list scrolls into view.
+    const loadToken = {};
+    currentSpotifyTracksLoad = loadToken;
+    if (spotifyTracksObserver) {
+        spotifyTracksObserver.disconnect();
+        spotifyTracksObserver = null;
+    }
+
+    const trackList = createElement('div', {
+        style: {
+            display: 'flex',
+            flexDirection: 'column',
+            gap: '8px'
+        }
+    });
+    const sentinel = createElement('div', {
+        text: 'Loading more tracks...',
+        style: {
+            textAlign: 'center',
+            color: 'var(--text-secondary)',
+            padding: '8px'
+        }
+    });
 
-        if (tracks.error) {
-            setPanelMessage(tracksList, tracks.error, 'var(--error)');
+    const loadPage = async (offset) => {
+        const res = await fetch(
+            `/api/spotify/playlist/${encodeURIComponent(playlistId)}/tracks?offset=${offset}&limit=${SPOTIFY_TRACKS_PAGE_SIZE}`
+        );
+        const page = await res.json();
+        if (currentSpotifyTracksLoad !== loadToken) {
+            return null;
+        }
+        if (page.error) {
+            throw new Error(page.error);
+        }
+
+        page.items.forEach((track) => trackList.appendChild(createSpotifyTrackRow(track)));
+        return page.next_offset;
+    };
+
+    try {
+        let nextOffset = await loadPage(0);
+        if (currentSpotifyTracksLoad !== loadToken) {
             return;
         }
 
-        if (!tracks.length) {
+        if (!trackList.childElementCount) {
             setPanelMessage(tracksList, 'No tracks found.');
             return;
         }
 
-        const trackList = createElement('div', {
-            style: {
-                display: 'flex',
-                flexDirection: 'column',
-                gap: '8px'
-            }
-        });
-
-        tracks.forEach((track) => {
-            const trackName = track.name || 'Unknown track';
-            const trackArtists = track.artists || 'Unknown artist';
-            const duration = track.duration_ms ? formatDuration(track.duration_ms) : '';
-            const imageFallback = () => createElement('div', {
-                text: '🎵',
-                style: {
-                    width: '40px',
-                    height: '40px',
-                    background: 'var(--input-bg)',
-                    borderRadius: '4px',
-                    display: 'flex',
-                    alignItems: 'center',
-                    justifyContent: 'center',
-                    fontSize: '1.2rem'
-                }
-            });
-            const media = track.image_url
-                ? createElement('img', {
-                    src: track.image_url,
-                    alt: '',
-                    style: {
-                        width: '40px',
-                        height: '40px',
-                        objectFit: 'cover',
-                        borderRadius: '4px'
-                    }
-                })
-                : imageFallback();
+        tracksList.replaceChildren(trackList);
+        if (nextOffset === null || nextOffset === undefined) {
+            return;
+        }
 
-            if (track.image_url) {
-                media.addEventListener('error', () => media.replaceWith(imageFallback()));
+        tracksList.appendChild(sentinel);
+        let loading = false;
+        const observer = new IntersectionObserver(async (entries) => {
+            if (loading || !entries.some((entry) => entry.isIntersecting)) {
+                return;
             }
 
-            const row = createElement('div', {
-                title: 'Click to play',
-                style: {
-                    display: 'flex',
-                    gap: '12px',
-                    alignItems: 'center',
-                    padding: '8px',
-                    background: 'var(--input-bg)',
-                    borderRadius: '6px',
-                    cursor: 'pointer'
+            loading = true;
+            try {
+                nextOffset = await loadPage(nextOffset);
+                if (nextOffset === null || nextOffset === undefined) {
+                    sentinel.remove();
                 }
-            }, [
-                media,
-                createElement('div', {
-                    style: {
-                        flexGrow: '1',
-                        minWidth: '0'
-                    }
-                }, [
-                    createElement('div', {
-                        text: trackName,
-                        style: {
-                            fontWeight: '500',
-                            overflow: 'hidden',
-                            textOverflow: 'ellipsis',
-                            whiteSpace: 'nowrap'
-                        }
-                    }),
-                    createElement('div', {
-                        text: trackArtists,
-                        style: {
-                            fontSize: '0.85rem',
-                            color: 'var(--text-secondary)',
-                            overflow: 'hidden',
-                            textOverflow: 'ellipsis',
-                            whiteSpace: 'nowrap'
-                        }
-                    })
-                ]),
-                createElement('div', {
-                    text: duration,
-                    style: {
-                        color: 'var(--text-secondary)',
-                        fontSize: '0.85rem',
-                        whiteSpace: 'nowrap'
-                    }
-                })
-            ]);
+            } catch (e) {
+                console.error("Failed to load more tracks", e);
+                sentinel.textContent = 'Failed to load more tracks.';
+                nextOffset = null;
+            }
+            loading = false;
 
-            row.addEventListener('click', () => {
-                playSpotifyTrack([track.uri], `${trackName} - ${trackArtists}`);
-            });
-            trackList.appendChild(row);
+            if (nextOffset === null || nextOffset === undefined) {
+                observer.disconnect();
+            }
         });
-
-        tracksList.replaceChildren(trackList);
+        spotifyTracksObserver = observer;
+        observer.observe(sentinel);
     } catch (e) {
         console.error("Failed to load tracks", e);
-        setPanelMessage(tracksList, 'Failed to load tracks.', 'var(--error)');
+        setPanelMessage(tracksList, e.message || 'Failed to load tracks.', 'var(--error)');
+    }
+}
+
+function createSpotifyTrackRow(track) {
+    const trackName = track.name || 'Unknown track';
+    const trackArtists = track.artists || 'Unknown artist';
+    const duration = track.duration_ms ? formatDuration(track.duration_ms) : '';
+    const imageFallback = () => createElement('div', {
+        text: '🎵',
+        style: {
+            width: '40px',
+            height: '40px',
+            background: 'var(--input-bg)',
+            borderRadius: '4px',
+            display: 'flex',
+            alignItems: 'center',
+            justifyContent: 'center',
+            fontSize: '1.2rem'
+        }
+    });
+    const media = track.image_url
+        ? createElement('img', {
+            src: artUrl(track.image_url, 64),
+            alt: '',
+            style: {
+                width: '40px',
+                height: '40px',
+                objectFit: 'cover',
+                borderRadius: '4px'
+            }
+        })
+        : imageFallback();
+
+    if (track.image_url) {
+        media.addEventListener('error', () => media.replaceWith(imageFallback()));
     }
+
+    const row = createElement('div', {
+        title: 'Click to play',
+        style: {
+            display: 'flex',
+            gap: '12px',
+            alignItems: 'center',
+            padding: '8px',
+            background: 'var(--input-bg)',
+            borderRadius: '6px',
+            cursor: 'pointer'
+        }
+    }, [
+        media,
+        createElement('div', {
+            style: {
+                flexGrow: '1',
+                minWidth: '0'
+            }
+        }, [
+            createElement('div', {
+                text: trackName,
+                style: {
+                    fontWeight: '500',
+                    overflow: 'hidden',
+                    textOverflow: 'ellipsis',
+                    whiteSpace: 'nowrap'
+                }
+            }),
+            createElement('div', {
+                text: trackArtists,
+                style: {
+                    fontSize: '0.85rem',
+                    color: 'var(--text-secondary)',
+                    overflow: 'hidden',
+                    textOverflow: 'ellipsis',
+                    whiteSpace: 'nowrap'
+                }
+            })
+        ]),
+        createElement('div', {
+            text: duration,
+            style: {
+                color: 'var(--text-secondary)',
+                fontSize: '0.85rem',
+                whiteSpace: 'nowrap'
+            }
+        })
+    ]);
+
+    row.addEventListener('click', () => {
+        playSpotifyTrack([track.uri], `${trackName} - ${trackArtists}`);
+    });
+    return row;
 }
 
 function formatDuration(ms) {
@@ -541,9 +541,16 @@ class DenonVtunerTile extends HTMLElement {
     `;
   }
 
+  artUrl(url, size = 64) {
+    if (!url || !/^https?:\/\//i.test(url)) {
+      return url;
+    }
+    return `${this.apiBase}/art?url=${encodeURIComponent(url)}&size=${size}`;
+  }
+
   renderImage(url, icon) {
     if (url) {
-      return `<img class="thumb" src="${denonVtunerEscape(url)}" alt="" loading="lazy">`;
+      return `<img class="thumb" src="${denonVtunerEscape(this.artUrl(url))}" alt="" loading="lazy">`;
     }
 
     return `
@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+# app.py reads its configuration at import time: no warm-up (no network, no
+# background workers), a throwaway state database and a fixed host address.
+_STATE_DIR = tempfile.mkdtemp(prefix="denon-vtuner-tests-")
+os.environ.update({
+    "WARMUP_ON_START": "false",
+    "STATE_DB_FILE": os.path.join(_STATE_DIR, "state.db"),
+    "HOST_IP": "192.168.1.10",
+    "HOST_PORT": "8877",
+    "DEBUG": "false",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,129 @@
+"""RadioBrowserClient against local stand-in mirrors with injected delays and failures."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import app
+
+STATIONS = [{"name": "Stub FM", "url": "http://stream.example.net/live"}]
+
+class StubMirror:
+    """A radio-browser mirror on localhost that answers after `delay` seconds with `status`."""
+
+    def __init__(self, delay=0.0, status=200):
+        self.delay = delay
+        self.status = status
+        self.requests = 0
+        self.answered = threading.Event()
+        mirror = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                mirror.requests += 1
+                time.sleep(mirror.delay)
+                body = json.dumps(STATIONS if mirror.status == 200 else {"error": "down"}).encode()
+                try:
+                    self.send_response(mirror.status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:  # the client gave up on this mirror
+                    pass
+                mirror.answered.set()
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+@pytest.fixture
+def mirrors():
+    started = []
+
+    def start(**kwargs):
+        mirror = StubMirror(**kwargs)
+        started.append(mirror)
+        return mirror
+
+    yield start
+    for mirror in started:
+        mirror.close()
+
+def fetch_timed(client, **kwargs):
+    started = time.monotonic()
+    data, mirror = client.fetch("json/stations/search", {"name": "stub"}, **kwargs)
+    return data, mirror, time.monotonic() - started
+
+def test_slow_mirror_is_hedged_and_fastest_answer_wins(mirrors):
+    slow = mirrors(delay=1.5)
+    fast = mirrors()
+    client = app.RadioBrowserClient([slow.url, fast.url])
+
+    data, mirror, elapsed = fetch_timed(client)
+
+    assert data == STATIONS
+    assert mirror == fast.url
+    assert slow.requests == 1 and fast.requests == 1
+    # The hedge goes out after the default delay, long before the slow answer.
+    assert app.RADIO_BROWSER_HEDGE_DEFAULT_DELAY <= elapsed < slow.delay
+
+def test_scores_reorder_mirrors_by_measured_latency(mirrors):
+    slow = mirrors(delay=0.6)
+    fast = mirrors()
+    client = app.RadioBrowserClient([slow.url, fast.url])
+    assert client.ranked_mirrors() == [slow.url, fast.url]
+
+    fetch_timed(client)
+    assert slow.answered.wait(2)
+    time.sleep(0.1)  # the slow attempt records its latency after answering
+
+    assert client.ranked_mirrors() == [fast.url, slow.url]
+    health = {entry["mirror"]: entry for entry in client.health()}
+    assert health[fast.url]["score"] < health[slow.url]["score"]
+
+    # The fast mirror is asked first now, so no hedge is needed.
+    _, mirror, elapsed = fetch_timed(client)
+    assert mirror == fast.url
+    assert elapsed < app.RADIO_BROWSER_HEDGE_DEFAULT_DELAY
+    assert slow.requests == 1
+
+def test_failing_mirror_fails_over_at_once_and_drops_in_rank(mirrors):
+    failing = mirrors(status=503)
+    healthy = mirrors()
+    client = app.RadioBrowserClient([failing.url, healthy.url])
+
+    data, mirror, elapsed = fetch_timed(client)
+
+    assert data == STATIONS
+    assert mirror == healthy.url
+    # Failover does not wait for the hedge delay.
+    assert elapsed < app.RADIO_BROWSER_HEDGE_DEFAULT_DELAY
+    assert client.ranked_mirrors() == [healthy.url, failing.url]
+    assert {entry["mirror"]: entry["failures"] for entry in client.health()}[failing.url] == 1
+
+def test_all_mirrors_failing_raises_the_last_error(mirrors):
+    client = app.RadioBrowserClient([mirrors(status=500).url, mirrors(status=503).url])
+
+    with pytest.raises(requests.HTTPError):
+        client.fetch("json/stations/search", {"name": "stub"})
+
+def test_all_mirrors_too_slow_raises_timeout(mirrors):
+    client = app.RadioBrowserClient([mirrors(delay=2).url, mirrors(delay=2).url])
+
+    started = time.monotonic()
+    # The overall deadline, or the first attempt's own read timeout of the same length.
+    with pytest.raises((TimeoutError, requests.Timeout)):
+        client.fetch("json/stations/search", {"name": "stub"}, timeout=0.8)
+    assert time.monotonic() - started < 1.5